@@ -0,0 +1,282 @@
+"""
+NumPy Mamdani inference engine for the Air Defense System Simulation.
+Authors: Maciej Uzarski, Maksymilian Mrówka
+
+Description:
+The scikit-fuzzy control system walks its rule graph and stores every intermediate membership in
+the shared ControlSystemSimulation on each compute(), so one simulation cannot be used by several
+threads and a single query costs milliseconds. MamdaniEngine compiles the same fuzzy variables and
+rules once into dense arrays:
+- the membership functions of every input variable as a (terms x universe) matrix,
+- the antecedent of every rule as the row indices of its AND-ed input terms,
+- the consequents as a (rules x output terms) weight matrix,
+- the sloped segments of the output terms, where clipping levels are crossed.
+
+Evaluating is then fuzzification by interpolation, rule firing by min over the antecedent rows,
+accumulation by max over the rules and centroid defuzzification, all as array operations over
+any number of inputs. The engine keeps no state between calls, so it can be shared between threads.
+
+The engine follows scikit-fuzzy's defaults (min for AND, max for accumulation, inputs clipped to
+the universes, centroid of the clipped terms sampled at the universe and the clipping crossings),
+so its outputs agree with the control system up to rounding. Running this module compares both
+on random inputs of the threat model.
+
+Usage:
+    python fuzzy_engine.py --samples 20000 --tolerance 1e-6
+"""
+
+import argparse
+import sys
+
+import numpy as np
+from skfuzzy.control.term import Term, TermAggregate
+
+
+class MamdaniEngine:
+    """
+    Mamdani fuzzy inference compiled into NumPy arrays.
+
+    Attributes:
+    - input_labels (list): Labels of the input variables, in the order evaluate takes them.
+    - universes (list): Universe of every input variable.
+    - memberships (list): (terms x universe) membership matrix of every input variable.
+    - clauses (numpy.ndarray): (rules x clauses) rows of the stacked input memberships AND-ed by
+      every rule, shorter antecedents are padded with the row of ones.
+    - weights (numpy.ndarray): (rules x output terms) weight of every rule's consequents.
+    - output_universe (numpy.ndarray): Universe of the output variable.
+    - output_memberships (numpy.ndarray): (terms x universe) membership matrix of the output variable.
+    - segments (tuple): Output term, start and end points and memberships of every sloped segment
+      of the output membership functions.
+    """
+
+    def __init__(self, inputs, output, rules):
+        """
+        Compiles the fuzzy variables and the rules.
+
+        Parameters:
+        - inputs (list): The input variables (ctrl.Antecedent).
+        - output (ctrl.Consequent): The output variable.
+        - rules (list): The rules (ctrl.Rule), with AND-ed antecedents.
+        """
+        self.input_labels = [variable.label for variable in inputs]
+        self.universes = [self.frozen(variable.universe) for variable in inputs]
+        self.memberships = [
+            self.frozen(np.array([term.mf for term in variable.terms.values()]))
+            for variable in inputs
+        ]
+
+        # Rows of the input terms once all membership matrices are stacked, the last row is all ones
+        rows = {}
+        for variable in inputs:
+            for term in variable.terms.values():
+                rows[term.parent.label, term.label] = len(rows)
+        ones_row = len(rows)
+
+        output_labels = list(output.terms)
+        antecedents = [self.antecedent_terms(rule.antecedent) for rule in rules]
+        clause_count = max(len(terms) for terms in antecedents)
+        clauses = np.full((len(rules), clause_count), ones_row, dtype=np.intp)
+        weights = np.zeros((len(rules), len(output_labels)))
+
+        for index, (rule, terms) in enumerate(zip(rules, antecedents)):
+            for clause, term in enumerate(terms):
+                if (term.parent.label, term.label) not in rows:
+                    raise ValueError(f"Rule {rule} uses a variable that is not an input")
+                clauses[index, clause] = rows[term.parent.label, term.label]
+            for consequent in rule.consequent:
+                if consequent.term.parent is not output:
+                    raise ValueError(f"Rule {rule} has a consequent that is not the output")
+                weights[index, output_labels.index(consequent.term.label)] = consequent.weight
+
+        self.clauses = self.frozen(clauses, np.intp)
+        self.weights = self.frozen(weights)
+
+        self.output_universe = self.frozen(output.universe)
+        self.output_memberships = self.frozen(
+            np.array([term.mf for term in output.terms.values()])
+        )
+
+        segment_terms, segment_starts = np.nonzero(
+            self.output_memberships[:, :-1] != self.output_memberships[:, 1:]
+        )
+        self.segments = (self.frozen(segment_terms, np.intp),) + tuple(
+            self.frozen(array)
+            for array in (
+                self.output_universe[segment_starts],
+                self.output_universe[segment_starts + 1],
+                self.output_memberships[segment_terms, segment_starts],
+                self.output_memberships[segment_terms, segment_starts + 1],
+            )
+        )
+
+    @staticmethod
+    def frozen(array, dtype=float):
+        """
+        Returns a read-only copy of the array, so that it can be shared between threads.
+        """
+        array = np.array(array, dtype=dtype)
+        array.setflags(write=False)
+        return array
+
+    @staticmethod
+    def antecedent_terms(antecedent):
+        """
+        Returns the input terms AND-ed by a rule's antecedent.
+
+        Parameters:
+        - antecedent (Term or TermAggregate): The antecedent of the rule.
+
+        Returns:
+        - list: The terms.
+        """
+        if isinstance(antecedent, Term):
+            return [antecedent]
+        if isinstance(antecedent, TermAggregate) and antecedent.kind == 'and':
+            return (
+                MamdaniEngine.antecedent_terms(antecedent.term1)
+                + MamdaniEngine.antecedent_terms(antecedent.term2)
+            )
+        raise ValueError(f"Only AND-ed terms are supported in antecedents, not {antecedent}")
+
+    def fuzzify(self, values):
+        """
+        Calculates the memberships of the inputs in all input terms.
+
+        Parameters:
+        - values (list): Array of crisp values of every input variable.
+
+        Returns:
+        - numpy.ndarray: (input terms + 1) x inputs matrix of memberships, the last row is all ones.
+        """
+        rows = []
+        for universe, memberships, variable_values in zip(self.universes, self.memberships, values):
+            # Inputs beyond the universe are clipped to it, like the control system does
+            position = np.interp(variable_values, universe, np.arange(len(universe)))
+            # NaN inputs keep a NaN fraction, so their memberships and output are NaN
+            index = np.minimum(np.nan_to_num(position).astype(np.intp), len(universe) - 2)
+            fraction = position - index
+            rows.append(memberships[:, index] * (1 - fraction) + memberships[:, index + 1] * fraction)
+        rows.append(np.ones((1, len(values[0]))))
+        return np.concatenate(rows)
+
+    def fire(self, memberships):
+        """
+        Fires all rules and accumulates the activations of every output term.
+
+        Parameters:
+        - memberships (numpy.ndarray): Input memberships, as returned by fuzzify.
+
+        Returns:
+        - numpy.ndarray: (output terms x inputs) clipping levels.
+        """
+        activations = memberships[self.clauses].min(axis=1)
+        return (self.weights[:, :, None] * activations[:, None, :]).max(axis=0)
+
+    def defuzzify(self, cuts):
+        """
+        Calculates the centroid of the maximum of the clipped output terms.
+
+        The output membership is sampled on the output universe plus the points where every term
+        crosses its clipping level, and is linear in between.
+
+        Parameters:
+        - cuts (numpy.ndarray): (output terms x inputs) clipping levels, as returned by fire.
+
+        Returns:
+        - numpy.ndarray: The crisp output of every input.
+        """
+        segment_terms, x0, x1, y0, y1 = self.segments
+        universe = self.output_universe
+        size = cuts.shape[1]
+
+        # Crossing of every sloped segment, segments not crossing their level only repeat a point
+        segment_cuts = cuts[segment_terms].T
+        crosses = (y0 >= segment_cuts) != (y1 >= segment_cuts)
+        crossings = np.where(crosses, x0 + (segment_cuts - y0) * (x1 - x0) / (y1 - y0), x0)
+        x = np.sort(
+            np.concatenate([np.broadcast_to(universe, (size, len(universe))), crossings], axis=1),
+            axis=1,
+        )
+
+        # Output membership at every point, interpolating the output terms on the universe
+        position = np.interp(x, universe, np.arange(len(universe)))
+        index = np.minimum(position.astype(np.intp), len(universe) - 2)
+        fraction = position - index
+        y = np.zeros_like(x)
+        for term, memberships in enumerate(self.output_memberships):
+            term_y = memberships[index] * (1 - fraction) + memberships[index + 1] * fraction
+            np.maximum(y, np.minimum(cuts[term][:, None], term_y), out=y)
+
+        # Exact area and moment of every trapezoid between neighbouring points
+        xa, xb = x[:, :-1], x[:, 1:]
+        ya, yb = y[:, :-1], y[:, 1:]
+        area = 0.5 * (xb - xa) * (ya + yb)
+        moment = (xb - xa) * (ya * (2 * xa + xb) + yb * (xa + 2 * xb)) / 6
+        return moment.sum(axis=1) / area.sum(axis=1)
+
+    def evaluate(self, *values):
+        """
+        Runs the inference for arrays of inputs.
+
+        Parameters:
+        - values (array_like): Crisp values of every input variable, in the order of input_labels.
+
+        Returns:
+        - numpy.ndarray: The crisp output, in the broadcast shape of the inputs, NaN where an input is NaN.
+        """
+        if len(values) != len(self.input_labels):
+            raise ValueError(f"Expected {len(self.input_labels)} inputs, got {len(values)}")
+
+        values = np.broadcast_arrays(*(np.asarray(value, dtype=float) for value in values))
+        shape = values[0].shape
+        flat_values = [value.ravel() for value in values]
+        return self.defuzzify(self.fire(self.fuzzify(flat_values))).reshape(shape)
+
+
+def compare_with_control_system(engine, control_system, values):
+    """
+    Runs the engine and a scikit-fuzzy control system for the same inputs.
+
+    Parameters:
+    - engine (MamdaniEngine): The compiled engine.
+    - control_system (ctrl.ControlSystem): The control system of the same variables and rules.
+    - values (list): Array of crisp values of every input variable, in the order of input_labels.
+
+    Returns:
+    - numpy.ndarray: Absolute difference of the outputs for every input.
+    """
+    from skfuzzy import control as ctrl
+
+    simulation = ctrl.ControlSystemSimulation(control_system)
+    for label, variable_values in zip(engine.input_labels, values):
+        simulation.input[label] = variable_values
+    simulation.compute()
+    (expected,) = simulation.output.values()
+    return np.abs(engine.evaluate(*values) - expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the NumPy engine with the scikit-fuzzy control system of the threat model."
+    )
+    parser.add_argument("--samples", type=int, default=20000)
+    parser.add_argument("--tolerance", type=float, default=1e-6)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    from threat_model import threat_ctrl, threat_engine
+
+    generator = np.random.default_rng(args.seed)
+    values = [
+        generator.uniform(universe[0], universe[-1], args.samples)
+        for universe in threat_engine.universes
+    ]
+    errors = compare_with_control_system(threat_engine, threat_ctrl, values)
+
+    print(f"{args.samples} samples, max difference {errors.max():.3g}, mean {errors.mean():.3g}")
+    if errors.max() > args.tolerance:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
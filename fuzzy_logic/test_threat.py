@@ -0,0 +1,143 @@
+"""
+Tests of the threat model for the Air Defense System Simulation.
+Authors: Maciej Uzarski, Maksymilian Mrówka
+
+Description:
+Checks the NumPy engine against the scikit-fuzzy control system, the override of the threat cache
+on exact inputs and that the threat-scoring service answers every track update.
+
+Usage (from this directory):
+    python -m pytest test_threat.py
+"""
+
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from fuzzy_engine import compare_with_control_system
+from threat_cache import ThreatCache, TrackScorer
+from threat_model import (
+    calculate_threat,
+    calculate_threat_batch,
+    is_overridden,
+    threat_ctrl,
+    threat_engine,
+)
+from threat_service import ThreatService
+
+
+def test_engine_matches_control_system():
+    generator = np.random.default_rng(0)
+    values = [
+        generator.uniform(universe[0], universe[-1], 2000)
+        for universe in threat_engine.universes
+    ]
+    errors = compare_with_control_system(threat_engine, threat_ctrl, values)
+    assert errors.max() < 1e-6
+
+
+def test_engine_matches_control_system_on_universe_edges():
+    values = [
+        np.array([universe[0], universe[-1], universe[len(universe) // 2]])
+        for universe in threat_engine.universes
+    ]
+    errors = compare_with_control_system(threat_engine, threat_ctrl, values)
+    assert errors.max() < 1e-6
+
+
+@pytest.mark.parametrize(
+    "distance, speed, angle",
+    [
+        # Overridden, like its quantized point (15 km)
+        (19.0, 4.6, 30.0),
+        # Not overridden, but its quantized point (15 km) would be
+        (21.0, 4.6, 30.0),
+        # Overridden, but its quantized speed (4.5 Mach) is not fast enough
+        (10.0, 4.51, 30.0),
+        # Neither
+        (300.0, 2.0, 30.0),
+    ],
+)
+def test_cache_applies_override_on_exact_inputs(distance, speed, angle):
+    cache = ThreatCache(resolution=(15.0, 0.05, 1.0))
+    scorer = TrackScorer(ThreatCache(resolution=(15.0, 0.05, 1.0)))
+    key = cache.key(distance, speed, angle)
+
+    if is_overridden(distance, speed):
+        expected = 100.0
+        assert key is None
+    else:
+        expected = cache.threat_function(*cache.point(key))
+        assert expected < 100.0
+
+    assert cache.lookup(distance, speed, angle) == expected
+    assert cache.lookup_keys([key]) == [expected]
+    assert scorer.score("track", distance, speed, angle) == expected
+    assert scorer.score_many(["other"], [distance], [speed], [angle]) == [expected]
+
+
+def test_cache_matches_calculate_threat_where_overridden():
+    generator = np.random.default_rng(1)
+    distances = generator.uniform(0, 40, 500)
+    speeds = generator.uniform(4, 5, 500)
+    angles = generator.uniform(0, 180, 500)
+    cache = ThreatCache()
+
+    for distance, speed, angle in zip(distances, speeds, angles):
+        if is_overridden(distance, speed):
+            assert cache.lookup(distance, speed, angle) == 100.0
+            assert calculate_threat(distance, speed, angle) == 100.0
+
+
+async def run_service(messages, max_batch_size):
+    """
+    Sends the messages to a service on a free local port and collects the answers
+    until every track update and every invalid message is answered.
+    """
+    service = ThreatService(max_batch_size, max_delay_ms=1.0, report_interval_s=0)
+    server = await service.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    for message in messages:
+        writer.write(message if isinstance(message, bytes) else json.dumps(message).encode() + b"\n")
+    await writer.drain()
+
+    answers = []
+    try:
+        while len(answers) < len(messages):
+            answers.append(json.loads(await asyncio.wait_for(reader.readline(), 10)))
+    finally:
+        writer.close()
+        server.close()
+        for task in service.tasks:
+            task.cancel()
+    return answers
+
+
+@pytest.mark.parametrize("max_batch_size", [1, 7, 1024])
+def test_service_answers_every_id(max_batch_size):
+    generator = np.random.default_rng(2)
+    tracks = np.column_stack([
+        generator.uniform(0, 1000, 200),
+        generator.uniform(0, 5, 200),
+        generator.uniform(0, 180, 200),
+    ])
+    messages = [
+        {"type": "track", "id": track_id, "distance": distance, "speed": speed, "angle": angle}
+        for track_id, (distance, speed, angle) in enumerate(tracks.tolist())
+    ]
+    messages.insert(50, b"not json\n")
+    messages.insert(120, {"type": "track", "id": "bad", "distance": "far", "speed": 1, "angle": 1})
+
+    answers = asyncio.run(run_service(messages, max_batch_size))
+
+    threats = {answer["id"]: answer["threat_level"] for answer in answers if answer["type"] == "threat"}
+    assert sorted(threats) == list(range(len(tracks)))
+    assert len(threats) + 2 == len(answers)
+    assert [answer["type"] for answer in answers].count("error") == 2
+
+    expected = calculate_threat_batch(tracks[:, 0], tracks[:, 1], tracks[:, 2])
+    assert np.allclose([threats[track_id] for track_id in range(len(tracks))], expected, atol=1e-4)
@@ -0,0 +1,199 @@
+"""
+Fuzzy threat model of the Air Defense System Simulation.
+Authors: Maciej Uzarski, Maksymilian Mrówka
+
+Description:
+Defines the fuzzy variables (distance, speed and angle of approach of a missile) and the rules
+that rate the threat level. The model is kept apart from the pygame simulation in main.py, so it
+can be imported by tools that have no display.
+
+The rules are compiled into a MamdaniEngine (see fuzzy_engine.py), which gives the same threat
+levels as the scikit-fuzzy control system but keeps no state between calls, so the functions
+below can be called from several threads. calculate_threat rates one missile and
+calculate_threat_batch whole arrays of missiles at once.
+"""
+
+import numpy as np
+import skfuzzy as fuzz
+from skfuzzy import control as ctrl
+
+from fuzzy_engine import MamdaniEngine
+
+# Define fuzzy variables for the inputs and output
+
+# Input 1: Distance of the missile
+distance = ctrl.Antecedent(np.arange(0, 1001, 1), 'distance')
+distance['near'] = fuzz.trapmf(distance.universe, [0, 0, 30, 100])
+distance['moderate'] = fuzz.trimf(distance.universe, [80, 300, 500])
+distance['far'] = fuzz.trapmf(distance.universe, [400, 700, 1000, 1000])
+
+# Input 2: Speed of the missile
+speed = ctrl.Antecedent(np.arange(0, 5, 0.1), 'speed')
+speed['slow'] = fuzz.trapmf(speed.universe, [0, 0, 0.5, 1.0])
+speed['medium'] = fuzz.trimf(speed.universe, [0.5, 1.5, 3.0])
+speed['fast'] = fuzz.trapmf(speed.universe, [2.0, 3.5, 5.0, 5.0])
+
+# Input 3: Angle of approach
+angle = ctrl.Antecedent(np.arange(0, 181, 1), 'angle')
+angle['small'] = fuzz.trapmf(angle.universe, [0, 0, 30, 60])
+angle['medium'] = fuzz.trimf(angle.universe, [30, 60, 120])
+angle['large'] = fuzz.trapmf(angle.universe, [90, 150, 180, 180])
+
+# Output: Threat Level
+threat_level = ctrl.Consequent(np.arange(0, 101, 1), 'threat_level')
+threat_level['low'] = fuzz.trapmf(threat_level.universe, [0, 0, 10, 30])
+threat_level['moderate'] = fuzz.trimf(threat_level.universe, [25, 50, 75])
+threat_level['high'] = fuzz.trapmf(threat_level.universe, [60, 85, 100, 100])
+
+# Updated rules for more granularity in near distances and extreme conditions
+rules = [
+    # Near distance with different speeds and angles for smoother increase
+    ctrl.Rule(distance['near'] & speed['slow'] & angle['small'], threat_level['moderate']),
+    ctrl.Rule(distance['near'] & speed['slow'] & angle['medium'], threat_level['moderate']),
+    ctrl.Rule(distance['near'] & speed['slow'] & angle['large'], threat_level['low']),
+    ctrl.Rule(distance['near'] & speed['medium'] & angle['small'], threat_level['high']),
+    ctrl.Rule(distance['near'] & speed['medium'] & angle['medium'], threat_level['high']),
+    ctrl.Rule(distance['near'] & speed['medium'] & angle['large'], threat_level['moderate']),
+    ctrl.Rule(distance['near'] & speed['fast'] & angle['small'], threat_level['high']),
+    ctrl.Rule(distance['near'] & speed['fast'] & angle['medium'], threat_level['high']),
+    ctrl.Rule(distance['near'] & speed['fast'] & angle['large'], threat_level['high']),
+
+    # Ensure high threat level when missile is near, regardless of angle, at high speed
+    ctrl.Rule(distance['near'] & speed['fast'], threat_level['high']),
+    ctrl.Rule(distance['near'] & speed['medium'], threat_level['high']),
+    ctrl.Rule(distance['near'] & speed['slow'], threat_level['moderate']),
+
+    # Moderate distance with different speeds and angles
+    ctrl.Rule(distance['moderate'] & speed['slow'] & angle['small'], threat_level['moderate']),
+    ctrl.Rule(distance['moderate'] & speed['slow'] & angle['medium'], threat_level['low']),
+    ctrl.Rule(distance['moderate'] & speed['slow'] & angle['large'], threat_level['low']),
+    ctrl.Rule(distance['moderate'] & speed['medium'] & angle['small'], threat_level['high']),
+    ctrl.Rule(distance['moderate'] & speed['medium'] & angle['medium'], threat_level['moderate']),
+    ctrl.Rule(distance['moderate'] & speed['medium'] & angle['large'], threat_level['moderate']),
+    ctrl.Rule(distance['moderate'] & speed['fast'] & angle['small'], threat_level['high']),
+    ctrl.Rule(distance['moderate'] & speed['fast'] & angle['medium'], threat_level['high']),
+    ctrl.Rule(distance['moderate'] & speed['fast'] & angle['large'], threat_level['moderate']),
+
+    # Additional rule to ensure high threat level at moderate distance with high speed
+    ctrl.Rule(distance['moderate'] & speed['fast'], threat_level['high']),
+
+    # Far distance with different speeds and angles
+    ctrl.Rule(distance['far'] & speed['slow'] & angle['small'], threat_level['low']),
+    ctrl.Rule(distance['far'] & speed['slow'] & angle['medium'], threat_level['low']),
+    ctrl.Rule(distance['far'] & speed['slow'] & angle['large'], threat_level['low']),
+    ctrl.Rule(distance['far'] & speed['medium'] & angle['small'], threat_level['moderate']),
+    ctrl.Rule(distance['far'] & speed['medium'] & angle['medium'], threat_level['moderate']),
+    ctrl.Rule(distance['far'] & speed['medium'] & angle['large'], threat_level['low']),
+    ctrl.Rule(distance['far'] & speed['fast'] & angle['small'], threat_level['high']),
+    ctrl.Rule(distance['far'] & speed['fast'] & angle['medium'], threat_level['moderate']),
+    ctrl.Rule(distance['far'] & speed['fast'] & angle['large'], threat_level['moderate']),
+
+    # Added rule to push high threat when near distance is reached
+    ctrl.Rule(distance['near'], threat_level['high'])
+]
+
+# Control system setup, the rules are evaluated by the NumPy engine compiled from them
+threat_ctrl = ctrl.ControlSystem(rules)
+threat_engine = MamdaniEngine([distance, speed, angle], threat_level, rules)
+
+# Missiles rated at once by calculate_threat_batch, bounds the size of the intermediate arrays
+BATCH_CHUNK_SIZE = 4096
+
+
+def calculate_threat(distance_value, speed_value, angle_value):
+    """
+    Calculates the threat level for a given distance, speed, and angle of approach.
+
+    Parameters:
+    - distance_value (float): The distance of the missile in kilometers.
+    - speed_value (float): The speed of the missile in Mach.
+    - angle_value (float): The angle of approach in degrees.
+
+    Returns:
+    - float: Calculated threat level percentage.
+    """
+
+    if is_overridden(distance_value, speed_value):
+        return 100.0
+
+    return compute_threat(distance_value, speed_value, angle_value)
+
+
+def is_overridden(distance_value, speed_value):
+    """
+    Tells whether a missile is so near and fast that its threat level is 100% whatever the rules give.
+
+    Parameters:
+    - distance_value (float or numpy.ndarray): The distance of the missile in kilometers.
+    - speed_value (float or numpy.ndarray): The speed of the missile in Mach.
+
+    Returns:
+    - bool or numpy.ndarray: True for overridden missiles.
+    """
+    return (distance_value < 20) & (speed_value > 4.5)
+
+
+def compute_threat(distance_value, speed_value, angle_value):
+    """
+    Runs the fuzzy inference for a given distance, speed, and angle of approach,
+    without the override for very near and fast missiles applied by calculate_threat.
+
+    Parameters:
+    - distance_value (float): The distance of the missile in kilometers.
+    - speed_value (float): The speed of the missile in Mach.
+    - angle_value (float): The angle of approach in degrees.
+
+    Returns:
+    - float: Threat level percentage given by the rules.
+    """
+    return float(threat_engine.evaluate(distance_value, speed_value, angle_value))
+
+
+def calculate_threat_batch(distance_values, speed_values, angle_values):
+    """
+    Calculates the threat levels of many missiles at once, like calculate_threat does for one.
+
+    Parameters:
+    - distance_values (array_like): The distances of the missiles in kilometers.
+    - speed_values (array_like): The speeds of the missiles in Mach.
+    - angle_values (array_like): The angles of approach in degrees.
+
+    Returns:
+    - numpy.ndarray: Threat level percentages, in the broadcast shape of the inputs.
+    """
+    threat_values = compute_threat_batch(distance_values, speed_values, angle_values)
+    overridden = is_overridden(np.asarray(distance_values), np.asarray(speed_values))
+    return np.where(overridden, 100.0, threat_values)
+
+
+def compute_threat_batch(distance_values, speed_values, angle_values):
+    """
+    Runs the fuzzy inference for many missiles at once, like compute_threat does for one,
+    without the override for very near and fast missiles.
+
+    Parameters:
+    - distance_values (array_like): The distances of the missiles in kilometers.
+    - speed_values (array_like): The speeds of the missiles in Mach.
+    - angle_values (array_like): The angles of approach in degrees.
+
+    Returns:
+    - numpy.ndarray: Threat level percentages given by the rules, in the broadcast shape of the inputs.
+    """
+    distance_values, speed_values, angle_values = np.broadcast_arrays(
+        np.asarray(distance_values, dtype=float),
+        np.asarray(speed_values, dtype=float),
+        np.asarray(angle_values, dtype=float),
+    )
+    shape = distance_values.shape
+    distance_values = distance_values.ravel()
+    speed_values = speed_values.ravel()
+    angle_values = angle_values.ravel()
+
+    threat_values = np.empty(len(distance_values))
+    for start in range(0, len(threat_values), BATCH_CHUNK_SIZE):
+        chunk = slice(start, start + BATCH_CHUNK_SIZE)
+        threat_values[chunk] = threat_engine.evaluate(
+            distance_values[chunk], speed_values[chunk], angle_values[chunk]
+        )
+
+    return threat_values.reshape(shape)
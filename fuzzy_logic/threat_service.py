@@ -0,0 +1,456 @@
+"""
+Headless threat-scoring service for the Air Defense System Simulation.
+Authors: Maciej Uzarski, Maksymilian Mrówka
+
+Description:
+Serves the fuzzy threat model (see threat_model.py) over a local TCP connection, without pygame or
+a display. Clients stream track updates and get the threat level of every update back.
+
+Every message is a single line of JSON. Requests of the client:
+- {"type": "track", "id": 7, "distance": 350, "speed": 2.5, "angle": 40}: A track update, the id
+  is any value the client uses to match the answer.
+- {"type": "stats"}: Asks for the throughput and latency statistics of the service.
+
+The server answers track updates with {"type": "threat", "id": 7, "threat_level": 61.2,
+"latency_ms": 1.3}, stats requests with a "stats" message and invalid requests with an "error"
+message. Track updates whose inputs are not finite numbers are invalid, and the updates of a
+batch that fails to be scored get an "error" message with their id. Answers of track updates can
+arrive in a different order than the updates were sent, clients should not wait for an answer
+before sending the next update.
+
+Updates from all connections are collected into micro-batches: a batch is scored as soon as it has
+max_batch_size updates or max_delay_ms after its first update arrived, with one call of
+calculate_threat_batch in a worker thread, so the event loop keeps reading updates meanwhile.
+Latencies are measured from receiving an update to sending its answer. The throughput and the
+99th percentile latency are logged every report interval.
+
+With --benchmark the service is started together with a client streaming random track updates
+over several connections, which prints the throughput and latencies it measured. Without --rate
+the client sends as fast as it can, which measures the capacity of the service (the latencies then
+mostly measure the queue), with --rate it sends a steady stream and measures the latencies at that load.
+
+Usage:
+    python threat_service.py --port 8766
+    python threat_service.py --benchmark 100000 --connections 4 --rate 5000
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+from threat_model import calculate_threat_batch
+
+
+logger = logging.getLogger("fuzzy_logic.threat_service")
+
+# Latencies kept for the statistics, older ones are dropped
+LATENCY_HISTORY = 100000
+
+
+def latency_summary(latencies_ms):
+    """
+    Returns the number of requests and the mean, median, 99th percentile and maximum latency in milliseconds.
+
+    Parameters:
+    - latencies_ms (iterable): Latencies in milliseconds.
+
+    Returns:
+    - dict: The summary.
+    """
+    if not latencies_ms:
+        return {"requests": 0}
+
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def track_inputs(request):
+    """
+    Returns the (distance, speed, angle) of a track update.
+
+    Raises:
+    - KeyError: If an input is missing.
+    - ValueError: If an input is not a finite number.
+    """
+    inputs = []
+    for name in ("distance", "speed", "angle"):
+        value = request[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"{name} must be a finite number, not {value!r}")
+        inputs.append(float(value))
+    return tuple(inputs)
+
+
+class ServiceMetrics:
+    """
+    Throughput and latency statistics of the service.
+
+    Attributes:
+    - started (float): Time the service started, from perf_counter.
+    - scored (int): Number of track updates scored.
+    - batches (int): Number of batches scored.
+    - latencies_ms (deque): Latencies of the last scored updates, in milliseconds.
+    - interval_started (float): Start of the current report interval.
+    - interval_scored (int): Number of updates scored in the current report interval.
+    - interval_latencies_ms (list): Latencies of the current report interval.
+    """
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.scored = 0
+        self.batches = 0
+        self.latencies_ms = deque(maxlen=LATENCY_HISTORY)
+        self.interval_started = self.started
+        self.interval_scored = 0
+        self.interval_latencies_ms = []
+
+    def record_batch(self, latencies_ms):
+        """
+        Records the latencies of the updates of a scored batch.
+        """
+        self.scored += len(latencies_ms)
+        self.batches += 1
+        self.latencies_ms.extend(latencies_ms)
+        self.interval_scored += len(latencies_ms)
+        self.interval_latencies_ms.extend(latencies_ms)
+
+    def summary(self):
+        """
+        Returns the JSON-ready statistics since the service started.
+        """
+        elapsed = perf_counter() - self.started
+        return {
+            "scored": self.scored,
+            "batches": self.batches,
+            "mean_batch_size": round(self.scored / self.batches, 2) if self.batches else None,
+            "updates_per_second": round(self.scored / elapsed, 1),
+            "latency": latency_summary(self.latencies_ms),
+        }
+
+    def report(self):
+        """
+        Logs the throughput and latencies of the report interval and starts a new one.
+        """
+        now = perf_counter()
+        if self.interval_scored:
+            logger.info(
+                "%.1f updates/s: %s",
+                self.interval_scored / (now - self.interval_started),
+                latency_summary(self.interval_latencies_ms),
+            )
+        self.interval_started = now
+        self.interval_scored = 0
+        self.interval_latencies_ms = []
+
+
+class MicroBatcher:
+    """
+    Collects track updates of all connections and scores them in batches.
+
+    Attributes:
+    - max_batch_size (int): Largest number of updates scored at once.
+    - max_delay_ms (float): Longest time the first update of a batch waits for more updates.
+    - metrics (ServiceMetrics): Statistics of the scored updates.
+    - pending (list): The (session, id, (distance, speed, angle), received) updates waiting to be scored.
+    """
+
+    def __init__(self, max_batch_size, max_delay_ms, metrics):
+        self.max_batch_size = max_batch_size
+        self.max_delay_ms = max_delay_ms
+        self.metrics = metrics
+        self.pending = []
+        self.ready = asyncio.Event()
+        self.full = asyncio.Event()
+
+    def submit(self, session, track_id, inputs, received):
+        """
+        Queues a track update, its answer is sent to the session once its batch is scored.
+        """
+        self.pending.append((session, track_id, inputs, received))
+        self.ready.set()
+        if len(self.pending) >= self.max_batch_size:
+            self.full.set()
+
+    async def run(self):
+        """
+        Scores the queued updates batch by batch, until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            await self.ready.wait()
+            if len(self.pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self.full.wait(), self.max_delay_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            if len(self.pending) < self.max_batch_size:
+                self.full.clear()
+            if not self.pending:
+                self.ready.clear()
+
+            inputs = np.array([update[2] for update in batch])
+            try:
+                threat_levels = await loop.run_in_executor(
+                    None, calculate_threat_batch, inputs[:, 0], inputs[:, 1], inputs[:, 2]
+                )
+            except Exception as error:
+                # Answer the updates of the failed batch and keep serving the next ones
+                logger.exception("Scoring a batch of %d updates failed", len(batch))
+                for session, track_id, _, _ in batch:
+                    session.send({"type": "error", "id": track_id, "message": str(error)})
+                continue
+
+            now = perf_counter()
+            latencies_ms = []
+            for (session, track_id, _, received), threat_level in zip(batch, threat_levels.tolist()):
+                latency_ms = (now - received) * 1000
+                latencies_ms.append(latency_ms)
+                session.send({
+                    "type": "threat",
+                    "id": track_id,
+                    "threat_level": round(threat_level, 4),
+                    "latency_ms": round(latency_ms, 3),
+                })
+            self.metrics.record_batch(latencies_ms)
+
+
+class Session:
+    """
+    A single client connection.
+    """
+
+    def __init__(self, server, reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+
+    def send(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message).encode() + b"\n")
+
+    async def run(self):
+        """
+        Reads the requests of the client until it disconnects.
+        """
+        while line := await self.reader.readline():
+            received = perf_counter()
+            try:
+                request = json.loads(line)
+                kind = request["type"]
+                if kind == "track":
+                    inputs = track_inputs(request)
+                    self.server.batcher.submit(self, request.get("id"), inputs, received)
+                elif kind == "stats":
+                    self.send({"type": "stats", **self.server.metrics.summary()})
+                else:
+                    raise ValueError(f"Unknown request type {kind!r}")
+            except (ValueError, KeyError, TypeError) as error:
+                self.send({"type": "error", "message": str(error)})
+
+            # Stop reading while the client does not read its answers
+            await self.writer.drain()
+
+
+class ThreatService:
+    """
+    TCP server scoring the track updates of any number of connections.
+
+    Attributes:
+    - metrics (ServiceMetrics): Throughput and latency statistics.
+    - batcher (MicroBatcher): Collects the updates into batches.
+    - report_interval_s (float): Time between two statistics reports in the log, 0 for no reports.
+    - connections (int): Number of currently open connections.
+    """
+
+    def __init__(self, max_batch_size=1024, max_delay_ms=2.0, report_interval_s=10.0):
+        self.metrics = ServiceMetrics()
+        self.batcher = MicroBatcher(max_batch_size, max_delay_ms, self.metrics)
+        self.report_interval_s = report_interval_s
+        self.connections = 0
+
+        # Background tasks of the batcher and the reports, started with the server
+        self.tasks = []
+
+    async def handle_connection(self, reader, writer):
+        session = Session(self, reader, writer)
+        self.connections += 1
+        peer = writer.get_extra_info("peername")
+        logger.info("Connection %s opened (%d open)", peer, self.connections)
+        try:
+            await session.run()
+        except ConnectionError:
+            pass
+        finally:
+            self.connections -= 1
+            writer.close()
+            logger.info("Connection %s closed (%d open)", peer, self.connections)
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(self.report_interval_s)
+            self.metrics.report()
+
+    async def start(self, host, port):
+        """
+        Starts serving in the background.
+
+        Returns:
+        - asyncio.Server: The server, its sockets give the port when port 0 was requested.
+        """
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        self.tasks.append(asyncio.create_task(self.batcher.run()))
+        if self.report_interval_s:
+            self.tasks.append(asyncio.create_task(self.report()))
+        logger.info("Serving on %s", ", ".join(str(sock.getsockname()) for sock in server.sockets))
+        return server
+
+    async def serve(self, host, port):
+        server = await self.start(host, port)
+        async with server:
+            await server.serve_forever()
+
+
+async def stream_tracks(host, port, updates, rate, seed):
+    """
+    Streams random track updates over one connection while reading the answers.
+
+    Parameters:
+    - host (str), port (int): Address of the service.
+    - updates (int): Number of updates to send.
+    - rate (float): Updates sent per second, None to send them as fast as possible.
+    - seed (int): Seed of the random tracks.
+
+    Returns:
+    - list: Latency of every update measured by the client, in milliseconds.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    generator = np.random.default_rng(seed)
+    tracks = np.column_stack([
+        generator.uniform(0, 1000, updates),
+        generator.uniform(0, 5, updates),
+        generator.uniform(0, 180, updates),
+    ]).tolist()
+    sent = [0.0] * updates
+    latencies_ms = []
+
+    async def send():
+        start = perf_counter()
+        for track_id, (distance, speed, angle) in enumerate(tracks):
+            if rate:
+                delay = start + track_id / rate - perf_counter()
+                if delay > 0:
+                    await writer.drain()
+                    await asyncio.sleep(delay)
+            message = {"type": "track", "id": track_id, "distance": distance, "speed": speed, "angle": angle}
+            sent[track_id] = perf_counter()
+            writer.write(json.dumps(message).encode() + b"\n")
+            if track_id % 256 == 255:
+                await writer.drain()
+        await writer.drain()
+
+    async def receive():
+        while len(latencies_ms) < updates:
+            answer = json.loads(await reader.readline())
+            latencies_ms.append((perf_counter() - sent[answer["id"]]) * 1000)
+
+    await asyncio.gather(send(), receive())
+    writer.close()
+    return latencies_ms
+
+
+async def benchmark(updates, connections, rate, max_batch_size, max_delay_ms):
+    """
+    Starts the service on a free local port and streams track updates to it.
+
+    Parameters:
+    - updates (int): Number of updates to send over all connections.
+    - connections (int): Number of connections sending updates at the same time.
+    - rate (float): Updates per second over all connections, None to send as fast as possible.
+    - max_batch_size (int), max_delay_ms (float): Batching of the service.
+
+    Returns:
+    - dict: Throughput and client-side latencies of the run, and the service's statistics.
+    """
+    service = ThreatService(max_batch_size, max_delay_ms, report_interval_s=0)
+    server = await service.start("127.0.0.1", 0)
+    port = server.sockets[0].getsockname()[1]
+
+    start = perf_counter()
+    results = await asyncio.gather(*(
+        stream_tracks("127.0.0.1", port, updates // connections, rate and rate / connections, seed)
+        for seed in range(connections)
+    ))
+    elapsed = perf_counter() - start
+
+    latencies_ms = [latency for result in results for latency in result]
+    server.close()
+    for task in service.tasks:
+        task.cancel()
+    return {
+        "updates_per_second": round(len(latencies_ms) / elapsed, 1),
+        "client_latency": latency_summary(latencies_ms),
+        "service": service.metrics.summary(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless threat-scoring service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--max-batch-size", type=int, default=1024)
+    parser.add_argument(
+        "--max-delay-ms",
+        type=float,
+        default=2.0,
+        help="Longest time an update waits for others to be scored with.",
+    )
+    parser.add_argument("--report-interval-s", type=float, default=10.0)
+    parser.add_argument(
+        "--benchmark",
+        type=int,
+        metavar="UPDATES",
+        help="Stream this many random track updates to a local service and print the statistics.",
+    )
+    parser.add_argument("--connections", type=int, default=4)
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="Updates per second sent by the benchmark (default: as fast as possible).",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    if args.benchmark:
+        results = asyncio.run(
+            benchmark(
+                args.benchmark, args.connections, args.rate, args.max_batch_size, args.max_delay_ms
+            )
+        )
+        print(json.dumps(results, indent=1))
+        return
+
+    service = ThreatService(args.max_batch_size, args.max_delay_ms, args.report_interval_s)
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
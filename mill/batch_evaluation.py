@@ -0,0 +1,180 @@
+"""
+Batch evaluation of Nine Men's Morris positions with NumPy.
+
+Scores many positions in one call with the same evaluation the search uses
+(see ``Board.evaluate`` in ``bitboard.py``): every checker is worth one point and every
+checker that is part of a completed mill five more, positive scores favour Player 2.
+
+Positions are rows of an (N, 24) int8 array holding the owner of every point
+(0 empty, 1 Player 1, 2 Player 2, like ``Board.state``). The checkers of every mill
+line are counted with one matrix product against the 24x16 line incidence matrix,
+and the points of completed mills with a second product against its transpose.
+
+Run as a script, the module labels the positions of self-play games (see ``self_play.py``)
+with their scores and the game results and saves them as a NumPy archive.
+
+Usage:
+    python batch_evaluation.py games.jsonl --output positions.npz
+"""
+
+import argparse
+import json
+import sys
+
+import numpy as np
+
+from bitboard import MILL_POINTS, POINT_COUNT, Board, parse_move
+from game_state import GameState
+
+
+# Extra value of a checker that is part of a completed mill, as in Board.toggle
+MILL_BONUS = 5
+
+# LINE_INCIDENCE[point, line] is 1 when the point (0-23) lies on the mill line.
+LINE_INCIDENCE = np.zeros((POINT_COUNT, len(MILL_POINTS)), dtype=np.int16)
+for _line, _points in enumerate(MILL_POINTS):
+    LINE_INCIDENCE[list(_points), _line] = 1
+
+# Value of bit i of a bitboard, used to unpack bitboards into rows
+_POINT_BITS = np.int64(1) << np.arange(POINT_COUNT, dtype=np.int64)
+
+
+def boards_to_array(boards: list[Board]):
+    """
+    Returns the (N, 24) int8 array of the boards.
+    """
+    player_1_pieces = np.fromiter(
+        (board.pieces[1] for board in boards), dtype=np.int64, count=len(boards)
+    )
+    player_2_pieces = np.fromiter(
+        (board.pieces[2] for board in boards), dtype=np.int64, count=len(boards)
+    )
+    return bitboards_to_array(player_1_pieces, player_2_pieces)
+
+
+def bitboards_to_array(player_1_pieces: np.ndarray, player_2_pieces: np.ndarray):
+    """
+    Unpacks arrays of both players' bitboards into the (N, 24) int8 array of the positions.
+    """
+    player_1 = (player_1_pieces[:, None] & _POINT_BITS) != 0
+    player_2 = (player_2_pieces[:, None] & _POINT_BITS) != 0
+    return (player_1 + 2 * player_2).astype(np.int8)
+
+
+def line_counts(positions: np.ndarray, player: int):
+    """
+    Returns the (N, 16) array of the player's checkers on every mill line.
+    """
+    return (positions == player).astype(np.int16) @ LINE_INCIDENCE
+
+
+def evaluate_positions(positions: np.ndarray):
+    """
+    Evaluates a batch of positions for Player 2.
+
+    Args:
+    - positions: (N, 24) array of point owners, or a single position of 24 points.
+
+    Returns:
+    The int32 array of the N scores, equal to Board.evaluate of every position.
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    if positions.ndim == 1:
+        positions = positions[None, :]
+
+    scores = np.zeros(len(positions), dtype=np.int32)
+    for player, sign in ((1, -1), (2, 1)):
+        owned = positions == player
+        completed_lines = (line_counts(positions, player) == 3).astype(np.int16)
+        in_mill = (completed_lines @ LINE_INCIDENCE.T) > 0
+        scores += sign * (
+            owned.sum(axis=1, dtype=np.int32)
+            + MILL_BONUS * in_mill.sum(axis=1, dtype=np.int32)
+        )
+
+    return scores
+
+
+def evaluate_children(state: GameState, moves: list[int]):
+    """
+    Evaluates the positions the moves of the side to move lead to, in one batch.
+
+    Returns:
+    The int32 array of the scores, in the order of the moves.
+    """
+    boards = []
+    for move in moves:
+        state.make_move(move)
+        boards.append(state.board.copy())
+        state.unmake_move(move)
+    return evaluate_positions(boards_to_array(boards))
+
+
+def replay_game(moves: list):
+    """
+    Replays the moves of a self-play record ("5", "4-5x7", None for a pass)
+    and returns every position of the game as a GameState, the final one included.
+    """
+    state = GameState()
+    states = [state.copy()]
+
+    for move in moves:
+        if move is None:
+            state.side_to_move = 3 - state.side_to_move
+        else:
+            state.make_move(parse_move(move))
+        states.append(state.copy())
+
+    return states
+
+
+def label_games(lines):
+    """
+    Turns self-play records (JSON lines) into a labelled dataset.
+
+    Returns:
+    A dictionary of arrays with one row per position: "positions" (N, 24),
+    "in_hand" (N, 2), "side_to_move", "scores" (static evaluation), "results" (1 if
+    Player 2 won the game, -1 if Player 1 won, 0 for a draw) and "games" (the game number).
+    """
+    states, results, games = [], [], []
+
+    for line in lines:
+        record = json.loads(line)
+        game_states = replay_game(record["moves"])
+        result = {None: 0, 1: -1, 2: 1}[record["winner"]]
+        states.extend(game_states)
+        results.extend([result] * len(game_states))
+        games.extend([record["game"]] * len(game_states))
+
+    positions = boards_to_array([state.board for state in states])
+    return {
+        "positions": positions,
+        "in_hand": np.array([state.in_hand[1:] for state in states], dtype=np.int8),
+        "side_to_move": np.array(
+            [state.side_to_move for state in states], dtype=np.int8
+        ),
+        "scores": evaluate_positions(positions),
+        "results": np.array(results, dtype=np.int8),
+        "games": np.array(games, dtype=np.int32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Label the positions of self-play games with their evaluation."
+    )
+    parser.add_argument("games", help="JSON lines file written by self_play.py.")
+    parser.add_argument("--output", default="positions.npz")
+    args = parser.parse_args()
+
+    with open(args.games) as file:
+        dataset = label_games(file)
+    np.savez_compressed(args.output, **dataset)
+    print(
+        f"Wrote {len(dataset['positions'])} positions to {args.output}", file=sys.stderr
+    )
+
+
+if __name__ == "__main__":
+    main()
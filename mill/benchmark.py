@@ -0,0 +1,247 @@
+"""
+Benchmark suite for the Nine Men's Morris engine.
+
+Searches a fixed corpus of positions from the placement, movement and endgame phases
+with every engine variant, one depth at a time, and records for every run the time
+to reach the depth, the searched positions, positions per second and the best moves.
+Best moves are compared against the "default" variant at the same depth.
+
+The results are written as JSON, so runs of different commits can be compared:
+    python benchmark.py --output before.json
+    python benchmark.py --output after.json --compare before.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from time import perf_counter
+
+from bitboard import Board, format_move
+from game_state import GameState
+from search import MinimaxSearch
+from transposition import TranspositionTable
+
+
+# Positions as (Player 1's positions, Player 2's positions, checkers in hand of both players,
+# side to move, deepest search), positions numbered 1-24 like the board in main.py.
+POSITIONS = {
+    "placement_empty": ((), (), (9, 9), 1, 6),
+    "placement_early": ((1, 5, 14), (2, 11), (6, 7), 2, 6),
+    "placement_late": (
+        (1, 2, 5, 8, 14, 20, 23),
+        (3, 4, 6, 10, 13, 17, 22),
+        (2, 2),
+        1,
+        6,
+    ),
+    "movement_crowded": (
+        (1, 2, 5, 8, 10, 14, 20, 23),
+        (3, 4, 6, 11, 13, 17, 19, 22, 24),
+        (0, 0),
+        1,
+        7,
+    ),
+    "movement_open": ((1, 5, 9, 14, 20, 22), (3, 4, 12, 17, 19, 24), (0, 0), 2, 7),
+    "endgame_4v4": ((1, 5, 13, 20), (3, 11, 16, 23), (0, 0), 1, 7),
+    "endgame_flying": ((1, 2, 14), (4, 9, 17, 22), (0, 0), 1, 5),
+}
+
+# Engine variants as functions creating a fresh search, the first one is the reference.
+VARIANTS = {
+    "default": lambda: MinimaxSearch(),
+    "plain_keys": lambda: MinimaxSearch(canonical_positions=False),
+    "small_table": lambda: MinimaxSearch(transposition_table=TranspositionTable(12)),
+}
+
+
+def build_position(name: str):
+    """
+    Returns the GameState of the named corpus position and its deepest search.
+    """
+    player_1_positions, player_2_positions, in_hand, side_to_move, max_depth = (
+        POSITIONS[name]
+    )
+    board = Board(
+        sum(1 << (position - 1) for position in player_1_positions),
+        sum(1 << (position - 1) for position in player_2_positions),
+    )
+    checkers = (
+        len(player_1_positions) + in_hand[0],
+        len(player_2_positions) + in_hand[1],
+    )
+    return GameState(board, checkers, in_hand, side_to_move), max_depth
+
+
+def run_position(name: str, variant: str, repeat: int = 1):
+    """
+    Searches the position with a fresh search of the variant to every depth up to the position's deepest.
+    Every depth is searched repeat times and the fastest run is kept.
+
+    Returns:
+    One result dictionary per depth.
+    """
+    state, max_depth = build_position(name)
+    results = []
+
+    for depth in range(1, max_depth + 1):
+        seconds = None
+        for _ in range(repeat):
+            search = VARIANTS[variant]()
+            root_moves = search.root_moves(state)
+            start = perf_counter()
+            value, best_moves, completed_depth = search.iterative_deepening(
+                state, root_moves, time_budget_ms=10**9, max_depth=depth
+            )
+            elapsed = perf_counter() - start
+            if seconds is None or elapsed < seconds:
+                seconds = elapsed
+
+        results.append(
+            {
+                "position": name,
+                "variant": variant,
+                "depth": completed_depth,
+                "seconds": round(seconds, 6),
+                "nodes": search.nodes,
+                "nodes_per_second": round(search.nodes / seconds) if seconds else None,
+                "value": value,
+                "best_moves": sorted(format_move(move) for move in best_moves),
+                "table_hit_rate": round(search.transposition_table.hit_rate(), 4),
+            }
+        )
+
+    return results
+
+
+def mark_agreement(results: list[dict]):
+    """
+    Adds to every result whether its best moves equal the reference variant's at the same position and depth.
+    """
+    reference_variant = next(iter(VARIANTS))
+    reference = {
+        (result["position"], result["depth"]): result["best_moves"]
+        for result in results
+        if result["variant"] == reference_variant
+    }
+
+    for result in results:
+        expected = reference.get((result["position"], result["depth"]))
+        result["agrees"] = expected is not None and result["best_moves"] == expected
+
+
+def git_commit():
+    """
+    Returns the hash of the checked out commit, or None outside a git repository.
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(positions: list[str], variants: list[str], repeat: int = 1):
+    """
+    Runs every variant on every position and returns the report.
+    """
+    results = []
+    for name in positions:
+        for variant in variants:
+            results.extend(run_position(name, variant, repeat))
+    mark_agreement(results)
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def compare(report: dict, baseline: dict, tolerance: float):
+    """
+    Prints the change of positions per second and of the time to the deepest depth of every
+    position and variant against the baseline report.
+
+    Returns:
+    The list of (position, variant) pairs that got slower than the tolerance allows.
+    """
+    def deepest(results):
+        runs = {}
+        for result in results:
+            key = (result["position"], result["variant"])
+            if key not in runs or result["depth"] > runs[key]["depth"]:
+                runs[key] = result
+        return runs
+
+    current = deepest(report["results"])
+    previous = deepest(baseline["results"])
+    regressions = []
+
+    for key, result in sorted(current.items()):
+        old = previous.get(key)
+        if old is None or old["depth"] != result["depth"]:
+            continue
+        speed = result["nodes_per_second"] / old["nodes_per_second"]
+        time_ratio = result["seconds"] / old["seconds"]
+        print(
+            f"{key[0]:<20} {key[1]:<12} depth {result['depth']}: "
+            f"{speed:6.2f}x positions/s, {time_ratio:6.2f}x time to depth"
+        )
+        if time_ratio > 1 + tolerance:
+            regressions.append(key)
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the mill engine.")
+    parser.add_argument(
+        "--positions", nargs="+", choices=POSITIONS, default=list(POSITIONS)
+    )
+    parser.add_argument(
+        "--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS)
+    )
+    parser.add_argument(
+        "--output", default="-", help="JSON file to write, '-' for standard output."
+    )
+    parser.add_argument(
+        "--compare", help="Earlier report to compare the results against."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of runs of every search, the fastest one is recorded.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.25,
+        help="Allowed relative slowdown of the time to depth.",
+    )
+    args = parser.parse_args()
+
+    report = run_benchmark(args.positions, args.variants, args.repeat)
+
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=1)
+        print()
+    else:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=1)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(report, json.load(file), args.tolerance)
+        if regressions:
+            print(f"Slower than the baseline: {regressions}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
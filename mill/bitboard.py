@@ -0,0 +1,388 @@
+"""
+Bitboard representation of the Nine Men's Morris board.
+
+Every player's checkers are stored as a single 24-bit integer. Bit ``i`` stands
+for board position ``i + 1`` (positions are numbered 1-24 in the same way as the
+board drawn in ``main.py``). Internally the engine works on 0-based points, the
+1-based positions are only used when talking to the players.
+
+Moves are encoded as plain integers so that they can be generated, stored and
+compared without allocating objects:
+- bits 0-4: the point the checker is put on,
+- bits 5-9: the point the checker is moved from plus one (0 for a placement),
+- bits 10-14: the point of the removed opponent's checker plus one (0 if no mill was formed).
+A placement without a capture is therefore encoded as the target point itself.
+"""
+
+import random
+
+
+POINT_COUNT = 24
+FULL_BOARD = (1 << POINT_COUNT) - 1
+
+# All 16 lines of three positions (1-24) that form a mill.
+MILLS = (
+    # Horizontal lines
+    (1, 2, 3),
+    (4, 5, 6),
+    (7, 8, 9),
+    (10, 11, 12),
+    (13, 14, 15),
+    (16, 17, 18),
+    (19, 20, 21),
+    (22, 23, 24),
+    # Vertical lines
+    (1, 10, 22),
+    (4, 11, 19),
+    (7, 12, 16),
+    (2, 5, 8),
+    (17, 20, 23),
+    (9, 13, 18),
+    (6, 14, 21),
+    (3, 15, 24),
+)
+
+MILL_MASKS = tuple(
+    sum(1 << (position - 1) for position in mill) for mill in MILLS
+)
+
+
+def _build_adjacent_masks():
+    """
+    Builds the neighbour mask of every point. Two points are adjacent when they
+    follow each other in one of the mill lines.
+    """
+    masks = [0] * POINT_COUNT
+
+    for first, middle, last in MILLS:
+        for a, b in ((first, middle), (middle, last)):
+            masks[a - 1] |= 1 << (b - 1)
+            masks[b - 1] |= 1 << (a - 1)
+
+    return tuple(masks)
+
+
+ADJACENT_MASKS = _build_adjacent_masks()
+
+# The 0-based points of every mill line and the indexes of the two mill lines through every point.
+MILL_POINTS = tuple(tuple(position - 1 for position in mill) for mill in MILLS)
+POINT_MILLS = tuple(
+    tuple(line for line, points in enumerate(MILL_POINTS) if point in points)
+    for point in range(POINT_COUNT)
+)
+# The masks of the two mill lines through every point.
+POINT_MILL_MASKS = tuple(
+    tuple(MILL_MASKS[line] for line in lines) for lines in POINT_MILLS
+)
+
+
+def mills_through(point: int):
+    """
+    Returns the masks of the two mill lines going through the point (0-23).
+    """
+    return POINT_MILL_MASKS[point]
+
+
+def completed_mills(pieces: int, point: int):
+    """
+    Returns the number of mills (0-2) through 'point' (0-23) that are complete
+    once a checker is added on it to the given bitboard.
+    """
+    pieces |= 1 << point
+    first, second = POINT_MILL_MASKS[point]
+    return (pieces & first == first) + (pieces & second == second)
+
+
+def completes_mill(pieces: int, point: int):
+    """
+    Checks if adding a checker on 'point' (0-23) to the given bitboard completes a mill.
+    """
+    pieces |= 1 << point
+    first, second = POINT_MILL_MASKS[point]
+    return pieces & first == first or pieces & second == second
+
+
+def mill_points(pieces: int):
+    """
+    Returns the bitboard of all checkers of the given bitboard that are part of a completed mill.
+    """
+    covered = 0
+    for mask in MILL_MASKS:
+        if pieces & mask == mask:
+            covered |= mask
+    return covered
+
+
+def _build_zobrist_keys(seed: int = 0x6D696C6C):
+    """
+    Builds the random 64-bit Zobrist keys used to hash positions:
+    one key per player and point, one per side to move and one per player and remaining-checker count.
+    A fixed seed keeps the hashes identical between runs and processes.
+    """
+    rng = random.Random(seed)
+    piece_keys = (
+        None,
+        tuple(rng.getrandbits(64) for _ in range(POINT_COUNT)),
+        tuple(rng.getrandbits(64) for _ in range(POINT_COUNT)),
+    )
+    side_keys = (None, rng.getrandbits(64), rng.getrandbits(64))
+    checker_keys = (
+        None,
+        tuple(rng.getrandbits(64) for _ in range(10)),
+        tuple(rng.getrandbits(64) for _ in range(10)),
+    )
+    return piece_keys, side_keys, checker_keys
+
+
+PIECE_KEYS, SIDE_KEYS, CHECKER_KEYS = _build_zobrist_keys()
+
+MOVE_POINT_MASK = 0x1F
+MOVE_FROM_SHIFT = 5
+MOVE_REMOVED_SHIFT = 10
+
+
+def encode_move(to_point: int, from_point: int = -1, removed_point: int = -1):
+    """
+    Encodes a move as an integer (see the module docstring for the layout).
+
+    Args:
+    - to_point: The point (0-23) the checker is put on.
+    - from_point: The point the checker is moved from, -1 for a placement.
+    - removed_point: The point of the captured opponent's checker, -1 if there is none.
+    """
+    return (
+        to_point
+        | (from_point + 1) << MOVE_FROM_SHIFT
+        | (removed_point + 1) << MOVE_REMOVED_SHIFT
+    )
+
+
+def decode_move(move: int):
+    """
+    Decodes an encoded move into a (to_point, from_point, removed_point) tuple,
+    using -1 for the parts the move does not have.
+    """
+    return (
+        move & MOVE_POINT_MASK,
+        ((move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK) - 1,
+        (move >> MOVE_REMOVED_SHIFT) - 1,
+    )
+
+
+def format_move(move: int):
+    """
+    Returns a readable form of the encoded move using positions 1-24:
+    "5" for a placement, "4-5" for a move and a trailing "x7" for a removed checker.
+    """
+    to_point, from_point, removed_point = decode_move(move)
+    text = str(to_point + 1)
+    if from_point >= 0:
+        text = f"{from_point + 1}-{text}"
+    if removed_point >= 0:
+        text += f"x{removed_point + 1}"
+    return text
+
+
+def parse_move(text: str):
+    """
+    Parses a move written with format_move ("5", "4-5" or "4-5x7") into an encoded move.
+    Raises ValueError if the text is not a move or names a position outside 1-24.
+    """
+    if not isinstance(text, str):
+        raise ValueError(f"Invalid move {text!r}, moves are written as text")
+    move_text, _, removed_text = text.strip().partition("x")
+    from_text, _, to_text = move_text.rpartition("-")
+    points = [
+        int(part) - 1 if part else -1 for part in (to_text, from_text, removed_text)
+    ]
+    if points[0] < 0 or not all(-1 <= point < POINT_COUNT for point in points):
+        raise ValueError(f"Invalid move {text!r}")
+    if (from_text == "" and "-" in move_text) or (removed_text == "" and "x" in text):
+        raise ValueError(f"Invalid move {text!r}")
+    return encode_move(*points)
+
+
+# Precomputed moves, so that the move generator only looks them up:
+# SLIDE_MOVES[from_point] holds a (target bit, target point, encoded move) tuple for every neighbour,
+# FLY_MOVES[from_point][to_point] the encoded move between any two points
+# and CAPTURE_FLAGS[point] the bits to add to a move to remove the opponent's checker on the point.
+SLIDE_MOVES = tuple(
+    tuple(
+        (1 << to_point, to_point, encode_move(to_point, from_point))
+        for to_point in range(POINT_COUNT)
+        if ADJACENT_MASKS[from_point] >> to_point & 1
+    )
+    for from_point in range(POINT_COUNT)
+)
+FLY_MOVES = tuple(
+    tuple(encode_move(to_point, from_point) for to_point in range(POINT_COUNT))
+    for from_point in range(POINT_COUNT)
+)
+CAPTURE_FLAGS = tuple((point + 1) << MOVE_REMOVED_SHIFT for point in range(POINT_COUNT))
+# The (bit, point, first mill mask, second mill mask) of every point in ascending order,
+# for loops over the points of a bitboard that also test mills.
+POINT_BITS = tuple(
+    (1 << point, point) + POINT_MILL_MASKS[point] for point in range(POINT_COUNT)
+)
+
+
+def iter_points(mask: int):
+    """
+    Yields the points (0-23) of all bits set in the mask, in ascending order.
+    """
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+class Board:
+    """
+    Compact game board made of two 24-bit integers, one per player.
+
+    Besides the bitboards the board keeps what the evaluation needs up to date on every move:
+    the number of each player's checkers in every mill line, the number of completed mills
+    through every point and the resulting score, so evaluating a position only reads it.
+
+    Attributes:
+    - pieces: Bitboards indexed by player number. Slot 0 is unused so that players 1 and 2 index it directly.
+    - hash: Zobrist hash of the checkers on the board, updated incrementally by every move.
+    - line_counts: Number of the player's checkers in every mill line, indexed by player number and line.
+    - mill_counts: Number of the player's completed mills through every point, indexed by player number and point.
+    - score: The evaluation of the position (see evaluate).
+    """
+
+    __slots__ = ("pieces", "hash", "line_counts", "mill_counts", "score")
+
+    def __init__(self, player_1_pieces: int = 0, player_2_pieces: int = 0):
+        self.pieces = [0, 0, 0]
+        self.hash = 0
+        self.line_counts = [None, [0] * len(MILLS), [0] * len(MILLS)]
+        self.mill_counts = [None, [0] * POINT_COUNT, [0] * POINT_COUNT]
+        self.score = 0
+
+        for player, pieces in ((1, player_1_pieces), (2, player_2_pieces)):
+            for point in iter_points(pieces):
+                self.toggle(player, point)
+
+    def copy(self):
+        """
+        Returns an independent copy of the board.
+        """
+        return Board(self.pieces[1], self.pieces[2])
+
+    def state(self, point: int):
+        """
+        Returns the owner of the point: 0 when it is empty, otherwise the player number.
+        """
+        bit = 1 << point
+        if self.pieces[1] & bit:
+            return 1
+        if self.pieces[2] & bit:
+            return 2
+        return 0
+
+    def empty_mask(self):
+        """
+        Returns the bitboard of all empty points.
+        """
+        return FULL_BOARD ^ (self.pieces[1] | self.pieces[2])
+
+    def toggle(self, player: int, point: int):
+        """
+        Puts the player's checker on the empty point (0-23) or takes it away if it is there,
+        updating the hash, the line counts and the score.
+        """
+        bit = 1 << point
+        pieces = self.pieces
+        line_counts = self.line_counts[player]
+        first, second = POINT_MILLS[point]
+        # Player 2's checkers raise the score, Player 1's lower it
+        sign = 1 if player == 2 else -1
+        self.hash ^= PIECE_KEYS[player][point]
+
+        # Most moves neither complete nor break a mill, only those walk the mill points
+        if pieces[player] & bit:
+            pieces[player] ^= bit
+            self.score -= sign
+            if line_counts[first] == 3 or line_counts[second] == 3:
+                self.update_mill_bonus(player, point, -1)
+            line_counts[first] -= 1
+            line_counts[second] -= 1
+        else:
+            pieces[player] ^= bit
+            self.score += sign
+            line_counts[first] += 1
+            line_counts[second] += 1
+            if line_counts[first] == 3 or line_counts[second] == 3:
+                self.update_mill_bonus(player, point, 1)
+
+    def update_mill_bonus(self, player: int, point: int, change: int):
+        """
+        Updates the mill counts and the score for the complete mills through the point,
+        which the player's checker on it completes (change 1) or is about to break (change -1).
+        """
+        line_counts = self.line_counts[player]
+        mill_counts = self.mill_counts[player]
+        bonus = 5 if player == 2 else -5
+
+        for line in POINT_MILLS[point]:
+            if line_counts[line] != 3:
+                continue
+            for mill_point in MILL_POINTS[line]:
+                if change < 0:
+                    # The mill is broken, its checkers may no longer be part of any mill
+                    mill_counts[mill_point] -= 1
+                    if not mill_counts[mill_point]:
+                        self.score -= bonus
+                else:
+                    # A mill is completed, its checkers not yet in a mill gain the bonus
+                    if not mill_counts[mill_point]:
+                        self.score += bonus
+                    mill_counts[mill_point] += 1
+
+    def make_move(self, player: int, move: int):
+        """
+        Applies an encoded move of the given player to the board.
+        """
+        from_point = (move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK
+        removed_point = move >> MOVE_REMOVED_SHIFT
+
+        if from_point:
+            self.toggle(player, from_point - 1)
+        self.toggle(player, move & MOVE_POINT_MASK)
+        if removed_point:
+            self.toggle(3 - player, removed_point - 1)
+
+    def unmake_move(self, player: int, move: int):
+        """
+        Takes back an encoded move previously applied with make_move.
+        """
+        from_point = (move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK
+        removed_point = move >> MOVE_REMOVED_SHIFT
+
+        if removed_point:
+            self.toggle(3 - player, removed_point - 1)
+        self.toggle(player, move & MOVE_POINT_MASK)
+        if from_point:
+            self.toggle(player, from_point - 1)
+
+    def remove_checker(self, player: int, point: int):
+        """
+        Removes the player's checker from the point (0-23). The point must hold one of the player's checkers.
+        """
+        self.toggle(player, point)
+
+    def forms_mill(self, player: int, point: int):
+        """
+        Checks if the player's checker on the point is part of a completed mill.
+        """
+        return self.mill_counts[player][point] > 0
+
+    def evaluate(self):
+        """
+        Scores the position from Player 2's point of view: every checker is worth
+        one point and every checker that is part of a completed mill five more.
+        The score is kept up to date by every move, so this only reads it.
+        """
+        return self.score
@@ -0,0 +1,280 @@
+"""
+Headless Nine Men's Morris game state.
+
+A GameState owns everything a single game needs (board, checker counts, phase and
+side to move), so any number of games can live side by side in one process.
+Nothing in this module reads input, prints or sleeps; the functions only
+generate, check and apply moves.
+"""
+
+from enum import Enum
+
+from bitboard import (
+    CAPTURE_FLAGS,
+    CHECKER_KEYS,
+    FLY_MOVES,
+    FULL_BOARD,
+    MOVE_FROM_SHIFT,
+    MOVE_POINT_MASK,
+    MOVE_REMOVED_SHIFT,
+    POINT_BITS,
+    POINT_MILL_MASKS,
+    SIDE_KEYS,
+    SLIDE_MOVES,
+    Board,
+    completes_mill,
+    iter_points,
+)
+from symmetry import canonical_hash
+
+
+CHECKERS_PER_PLAYER = 9
+# A player left with this many checkers may move them to any empty position
+FLYING_CHECKER_COUNT = 3
+# A player left with this many checkers loses the game
+LOSING_CHECKER_COUNT = 2
+
+
+class Phase(Enum):
+    PLACEMENT = 0
+    MOVEMENT = 1
+    FLYING = 2
+
+
+class GameState:
+    """
+    State of a single game.
+
+    Attributes:
+    - board: The Board with both players' checkers.
+    - checkers: Checkers each player has left (placed or in hand), indexed by player number.
+    - in_hand: Checkers each player still has to place, indexed by player number.
+    - side_to_move: The player to make the next move (1 or 2).
+    """
+
+    __slots__ = ("board", "checkers", "in_hand", "side_to_move")
+
+    def __init__(
+        self,
+        board: Board = None,
+        checkers: tuple[int, int] = (CHECKERS_PER_PLAYER, CHECKERS_PER_PLAYER),
+        in_hand: tuple[int, int] = (CHECKERS_PER_PLAYER, CHECKERS_PER_PLAYER),
+        side_to_move: int = 1,
+    ):
+        self.board = board if board is not None else Board()
+        self.checkers = [0, checkers[0], checkers[1]]
+        self.in_hand = [0, in_hand[0], in_hand[1]]
+        self.side_to_move = side_to_move
+
+    def copy(self):
+        """
+        Returns an independent copy of the state.
+        """
+        return GameState(
+            self.board.copy(),
+            (self.checkers[1], self.checkers[2]),
+            (self.in_hand[1], self.in_hand[2]),
+            self.side_to_move,
+        )
+
+    def phase(self, player: int = None):
+        """
+        Returns the phase the player (by default the side to move) is in.
+        """
+        if player is None:
+            player = self.side_to_move
+
+        if self.in_hand[player] > 0:
+            return Phase.PLACEMENT
+        if self.checkers[player] == FLYING_CHECKER_COUNT:
+            return Phase.FLYING
+        return Phase.MOVEMENT
+
+    def is_over(self):
+        """
+        Checks if one of the players is left with too few checkers to continue.
+        """
+        return (
+            self.checkers[1] <= LOSING_CHECKER_COUNT
+            or self.checkers[2] <= LOSING_CHECKER_COUNT
+        )
+
+    def winner(self):
+        """
+        Returns the number of the winning player, or None while the game is still on.
+        """
+        if self.checkers[1] <= LOSING_CHECKER_COUNT:
+            return 2
+        if self.checkers[2] <= LOSING_CHECKER_COUNT:
+            return 1
+        return None
+
+    def key(self):
+        """
+        Returns the Zobrist hash of the state: the checkers on the board,
+        the side to move and the remaining checker counts of both players.
+        """
+        return (
+            self.board.hash
+            ^ SIDE_KEYS[self.side_to_move]
+            ^ CHECKER_KEYS[1][self.checkers[1]]
+            ^ CHECKER_KEYS[2][self.checkers[2]]
+        )
+
+    def canonical_key(self):
+        """
+        Returns the hash of the state that all 16 symmetric images of it share (see ``symmetry.py``),
+        together with the symmetry mapping this state to the canonical one.
+        """
+        board_hash, symmetry = canonical_hash(self.board)
+        return (
+            board_hash
+            ^ SIDE_KEYS[self.side_to_move]
+            ^ CHECKER_KEYS[1][self.checkers[1]]
+            ^ CHECKER_KEYS[2][self.checkers[2]]
+        ), symmetry
+
+    def make_move(self, move: int):
+        """
+        Applies an encoded move of the side to move in place and passes the turn.
+        """
+        player = self.side_to_move
+        board = self.board
+        from_point = (move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK
+        removed_point = move >> MOVE_REMOVED_SHIFT
+
+        # The same steps as Board.make_move, toggled here to save a call on every search node
+        if from_point:
+            board.toggle(player, from_point - 1)
+        else:
+            self.in_hand[player] -= 1
+        board.toggle(player, move & MOVE_POINT_MASK)
+        if removed_point:
+            board.toggle(3 - player, removed_point - 1)
+            self.checkers[3 - player] -= 1
+
+        self.side_to_move = 3 - player
+
+    def unmake_move(self, move: int):
+        """
+        Takes back the last move applied with make_move.
+        """
+        player = 3 - self.side_to_move
+        board = self.board
+        from_point = (move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK
+        removed_point = move >> MOVE_REMOVED_SHIFT
+
+        if removed_point:
+            board.toggle(3 - player, removed_point - 1)
+            self.checkers[3 - player] += 1
+        board.toggle(player, move & MOVE_POINT_MASK)
+        if from_point:
+            board.toggle(player, from_point - 1)
+        else:
+            self.in_hand[player] += 1
+
+        self.side_to_move = player
+
+
+def forms_mill(board: Board, player: int, point: int):
+    """
+    Checks if the player's checker at 'point' (0-23) is part of a mill (three in a row).
+    """
+    return board.forms_mill(player, point)
+
+
+def move_forms_mill(state: GameState, move: int):
+    """
+    Checks if the encoded move of the side to move would complete a mill.
+    """
+    pieces = state.board.pieces[state.side_to_move]
+    from_point = (move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK
+    if from_point:
+        pieces ^= 1 << (from_point - 1)
+
+    return completes_mill(pieces, move & MOVE_POINT_MASK)
+
+
+def generate_moves(state: GameState, moves: list[int] = None, captures: bool = True):
+    """
+    Generates all legal moves of the side to move for its phase: placing a checker on an empty
+    position, sliding a checker to an empty neighbouring position or, with three checkers left,
+    flying a checker to any empty position.
+
+    A move forming a mill is generated once for every opponent's checker it can remove,
+    unless 'captures' is False. The moves are looked up in the precomputed tables of
+    ``bitboard.py`` and appended to 'moves', so the search can reuse one list per depth.
+
+    Args:
+    - state: The position to generate the moves in.
+    - moves: List to fill, it is cleared first (a new list is created when omitted).
+    - captures: Whether to expand mill-forming moves into their capture choices.
+
+    Returns:
+    The list of encoded moves.
+    """
+    if moves is None:
+        moves = []
+    else:
+        moves.clear()
+
+    player = state.side_to_move
+    own_pieces = state.board.pieces[player]
+    opponent_pieces = state.board.pieces[3 - player]
+    empty = FULL_BOARD ^ (own_pieces | opponent_pieces)
+    capture_flags = (
+        [CAPTURE_FLAGS[point] for point in iter_points(opponent_pieces)]
+        if captures
+        else ()
+    )
+    append = moves.append
+
+    # Every search node generates moves, so the mill test and the bit loops are written out
+    # here instead of calling completes_mill and iter_points for every target
+    if state.in_hand[player] > 0:
+        # Placement: a placement move is equal to the point it puts the checker on
+        for to_bit, to_point, first, second in POINT_BITS:
+            if empty & to_bit:
+                pieces = own_pieces | to_bit
+                if capture_flags and (pieces & first == first or pieces & second == second):
+                    for flag in capture_flags:
+                        append(to_point | flag)
+                else:
+                    append(to_point)
+    elif state.checkers[player] == FLYING_CHECKER_COUNT:
+        for from_bit, from_point, _, _ in POINT_BITS:
+            if own_pieces & from_bit:
+                remaining = own_pieces ^ from_bit
+                fly_moves = FLY_MOVES[from_point]
+                for to_bit, to_point, first, second in POINT_BITS:
+                    if empty & to_bit:
+                        pieces = remaining | to_bit
+                        if capture_flags and (pieces & first == first or pieces & second == second):
+                            for flag in capture_flags:
+                                append(fly_moves[to_point] | flag)
+                        else:
+                            append(fly_moves[to_point])
+    else:
+        for from_bit, from_point, _, _ in POINT_BITS:
+            if own_pieces & from_bit:
+                remaining = own_pieces ^ from_bit
+                for to_bit, to_point, move in SLIDE_MOVES[from_point]:
+                    if empty & to_bit:
+                        pieces = remaining | to_bit
+                        first, second = POINT_MILL_MASKS[to_point]
+                        if capture_flags and (pieces & first == first or pieces & second == second):
+                            for flag in capture_flags:
+                                append(move | flag)
+                        else:
+                            append(move)
+
+    return moves
+
+
+def apply_move(state: GameState, move: int):
+    """
+    Returns a new state with the encoded move of the side to move applied, the given state is left untouched.
+    """
+    new_state = state.copy()
+    new_state.make_move(move)
+    return new_state
@@ -0,0 +1,401 @@
+"""
+Learned evaluation for the Nine Men's Morris AI.
+
+A small model (linear or a multilayer perceptron with one tanh hidden layer) predicts
+the result of the game from a handful of board features of both players: checkers on
+the board and in hand, checkers in completed mills, open twos (two checkers on a line
+whose third point is empty), blocked checkers and whether the player is flying.
+It is trained on the positions of self-play games labelled with the games' results
+(see ``batch_evaluation.py``) and replaces the hand-tuned evaluation of the search when
+passed to MinimaxSearch as its evaluator.
+
+Inference only needs NumPy. Features are computed for whole batches of positions with
+array operations, or for a single GameState from the board's incremental line counts.
+The feature normalization is folded into the first layer, so the weights file (a NumPy
+archive of a few hundred float32 numbers) holds nothing but the layers.
+
+Usage:
+    python self_play.py --games 500 --workers 4 --output games.jsonl
+    python batch_evaluation.py games.jsonl --output positions.npz
+    python learned_evaluation.py positions.npz --model mlp --output evaluation_weights.npz
+"""
+
+import argparse
+import math
+import os
+import sys
+
+import numpy as np
+
+from batch_evaluation import LINE_INCIDENCE, line_counts
+from bitboard import ADJACENT_MASKS, MILL_MASKS, POINT_COUNT, iter_points
+from game_state import FLYING_CHECKER_COUNT, GameState
+
+
+EVALUATION_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "evaluation_weights.npz"
+)
+
+FEATURE_NAMES = tuple(
+    f"{name}_{player}"
+    for player in (1, 2)
+    for name in ("on_board", "in_hand", "mill_points", "open_twos", "blocked", "flying")
+) + ("player_2_to_move",)
+
+# Scores are the predicted result (-1 Player 1 wins, 1 Player 2 wins) times this scale,
+# which keeps them well inside the search's WIN_SCORE.
+EVALUATION_SCALE = 100
+
+# ADJACENCY[point, neighbour] is 1 when the points are adjacent.
+ADJACENCY = np.array(
+    [[mask >> other & 1 for other in range(POINT_COUNT)] for mask in ADJACENT_MASKS],
+    dtype=np.int16,
+)
+
+
+def batch_features(positions: np.ndarray, in_hand: np.ndarray, side_to_move: np.ndarray):
+    """
+    Computes the features of a batch of positions.
+
+    Args:
+    - positions: (N, 24) array of point owners (see ``batch_evaluation.py``).
+    - in_hand: (N, 2) array of both players' checkers in hand.
+    - side_to_move: (N,) array of the players to move.
+
+    Returns:
+    The (N, 13) float32 feature array, columns in the order of FEATURE_NAMES.
+    """
+    positions = np.asarray(positions, dtype=np.int8)
+    in_hand = np.asarray(in_hand)
+    empty_neighbours = (positions == 0).astype(np.int16) @ ADJACENCY
+    counts = {player: line_counts(positions, player) for player in (1, 2)}
+    columns = []
+
+    for player in (1, 2):
+        owned = positions == player
+        lines, opponent_lines = counts[player], counts[3 - player]
+        on_board = owned.sum(axis=1)
+        hand = in_hand[:, player - 1]
+        completed = (lines == 3).astype(np.int16)
+        columns += [
+            on_board,
+            hand,
+            ((completed @ LINE_INCIDENCE.T) > 0).sum(axis=1),
+            ((lines == 2) & (opponent_lines == 0)).sum(axis=1),
+            (owned & (empty_neighbours == 0)).sum(axis=1),
+            (hand == 0) & (on_board == FLYING_CHECKER_COUNT),
+        ]
+    columns.append(np.asarray(side_to_move) == 2)
+
+    return np.stack(columns, axis=1).astype(np.float32)
+
+
+def state_features(state: GameState):
+    """
+    Computes the features of a single position, equal to its row of batch_features.
+    """
+    board = state.board
+    empty = board.empty_mask()
+    features = []
+
+    for player in (1, 2):
+        pieces = board.pieces[player]
+        opponent_lines = board.line_counts[3 - player]
+        mill_mask = 0
+        open_twos = 0
+        for line, count in enumerate(board.line_counts[player]):
+            if count == 3:
+                mill_mask |= MILL_MASKS[line]
+            elif count == 2 and not opponent_lines[line]:
+                open_twos += 1
+        blocked = sum(
+            1 for point in iter_points(pieces) if not ADJACENT_MASKS[point] & empty
+        )
+        on_board = pieces.bit_count()
+        hand = state.in_hand[player]
+        features += [
+            on_board,
+            hand,
+            mill_mask.bit_count(),
+            open_twos,
+            blocked,
+            int(hand == 0 and on_board == FLYING_CHECKER_COUNT),
+        ]
+    features.append(int(state.side_to_move == 2))
+
+    return features
+
+
+class LearnedEvaluator:
+    """
+    Trained evaluation model.
+
+    Attributes:
+    - layers: (weights, biases) float32 pairs of the layers. Hidden layers and the output use tanh,
+      the output is the predicted result of the game from Player 2's point of view.
+    """
+
+    def __init__(self, layers: list[tuple[np.ndarray, np.ndarray]]):
+        self.layers = [
+            (np.asarray(weights, dtype=np.float32), np.asarray(biases, dtype=np.float32))
+            for weights, biases in layers
+        ]
+
+        # A linear model is evaluated in plain Python, cheaper than NumPy for a single position
+        self.linear_weights = None
+        if len(self.layers) == 1:
+            weights, biases = self.layers[0]
+            self.linear_weights = weights[:, 0].tolist()
+            self.linear_bias = float(biases[0])
+
+    @classmethod
+    def load(cls, path: str = EVALUATION_PATH):
+        """
+        Loads the model from a weights file written by save.
+        """
+        with np.load(path) as archive:
+            layer_count = len(archive.files) // 2
+            return cls(
+                [
+                    (archive[f"weights_{i}"], archive[f"biases_{i}"])
+                    for i in range(layer_count)
+                ]
+            )
+
+    def save(self, path: str):
+        arrays = {}
+        for i, (weights, biases) in enumerate(self.layers):
+            arrays[f"weights_{i}"] = weights
+            arrays[f"biases_{i}"] = biases
+        np.savez(path, **arrays)
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, LearnedEvaluator)
+            and len(self.layers) == len(other.layers)
+            and all(
+                np.array_equal(weights, other_weights)
+                and np.array_equal(biases, other_biases)
+                for (weights, biases), (other_weights, other_biases) in zip(
+                    self.layers, other.layers
+                )
+            )
+        )
+
+    @property
+    def kind(self):
+        return "linear" if len(self.layers) == 1 else "mlp"
+
+    def predict(self, features: np.ndarray):
+        """
+        Returns the predicted results (-1 to 1) of an (N, 13) feature array.
+        """
+        values = features
+        for weights, biases in self.layers:
+            values = np.tanh(values @ weights + biases)
+        return values[:, 0]
+
+    def evaluate_batch(
+        self, positions: np.ndarray, in_hand: np.ndarray, side_to_move: np.ndarray
+    ):
+        """
+        Evaluates a batch of positions for Player 2 (see batch_features for the arguments).
+
+        Returns:
+        The int32 array of the N scores.
+        """
+        values = self.predict(batch_features(positions, in_hand, side_to_move))
+        return np.rint(EVALUATION_SCALE * values).astype(np.int32)
+
+    def evaluate(self, state: GameState):
+        """
+        Evaluates a single position for Player 2, used by the search at its leaves.
+        """
+        features = state_features(state)
+        if self.linear_weights is not None:
+            value = math.tanh(
+                self.linear_bias
+                + sum(
+                    weight * feature
+                    for weight, feature in zip(self.linear_weights, features)
+                )
+            )
+        else:
+            value = self.predict(np.array([features], dtype=np.float32))[0]
+        return round(EVALUATION_SCALE * float(value))
+
+
+def train(
+    features: np.ndarray,
+    results: np.ndarray,
+    games: np.ndarray,
+    kind: str = "mlp",
+    hidden: int = 16,
+    epochs: int = 30,
+    batch_size: int = 1024,
+    learning_rate: float = 0.003,
+    validation_fraction: float = 0.1,
+    seed: int = 0,
+    log=None,
+):
+    """
+    Trains a model to predict the game results with Adam on the mean squared error.
+
+    Args:
+    - features: (N, 13) feature array of the positions.
+    - results: (N,) results of the positions' games (-1, 0 or 1).
+    - games: (N,) game numbers, whole games are held out for validation.
+    - kind: "linear" or "mlp".
+    - hidden: Size of the hidden layer of the "mlp" model.
+    - epochs: Number of passes over the training positions.
+    - batch_size: Number of positions per gradient step.
+    - learning_rate: Adam's step size.
+    - validation_fraction: Fraction of the games held out for validation.
+    - seed: Seed of the weight initialization, the validation split and the shuffling.
+    - log: Text file to report the losses of every epoch to (optional).
+
+    Returns:
+    The LearnedEvaluator and the indexes of the validation positions.
+    """
+    rng = np.random.default_rng(seed)
+    features = np.asarray(features, dtype=np.float32)
+    results = np.asarray(results, dtype=np.float32)
+
+    unique_games = np.unique(games)
+    validation_games = rng.choice(
+        unique_games, int(len(unique_games) * validation_fraction), replace=False
+    )
+    is_validation = np.isin(games, validation_games)
+    training = np.flatnonzero(~is_validation)
+    validation = np.flatnonzero(is_validation)
+
+    # Train on standardized features, the standardization is folded into the first layer afterwards
+    mean = features[training].mean(axis=0)
+    std = features[training].std(axis=0)
+    std[std == 0] = 1
+    normalized = (features - mean) / std
+
+    sizes = [features.shape[1]] + ([hidden] if kind == "mlp" else []) + [1]
+    parameters = []
+    for inputs, outputs in zip(sizes, sizes[1:]):
+        parameters.append(
+            rng.normal(0, 1 / math.sqrt(inputs), (inputs, outputs)).astype(np.float32)
+        )
+        parameters.append(np.zeros(outputs, dtype=np.float32))
+    moments = [np.zeros_like(parameter) for parameter in parameters]
+    squares = [np.zeros_like(parameter) for parameter in parameters]
+    step = 0
+
+    def forward(inputs):
+        activations = [inputs]
+        for i in range(0, len(parameters), 2):
+            activations.append(np.tanh(activations[-1] @ parameters[i] + parameters[i + 1]))
+        return activations
+
+    def loss(indexes):
+        return float(
+            np.mean((forward(normalized[indexes])[-1][:, 0] - results[indexes]) ** 2)
+        )
+
+    for epoch in range(epochs):
+        order = rng.permutation(training)
+        for start in range(0, len(order), batch_size):
+            batch = order[start : start + batch_size]
+            activations = forward(normalized[batch])
+            output = activations[-1]
+            # Gradient of the mean squared error through the output's tanh
+            delta = 2 * (output - results[batch, None]) * (1 - output**2) / len(batch)
+
+            gradients = []
+            for layer in reversed(range(len(parameters) // 2)):
+                gradients.append(delta.sum(axis=0))
+                gradients.append(activations[layer].T @ delta)
+                if layer:
+                    delta = (delta @ parameters[2 * layer].T) * (
+                        1 - activations[layer] ** 2
+                    )
+            gradients.reverse()
+
+            step += 1
+            for i, gradient in enumerate(gradients):
+                moments[i] = 0.9 * moments[i] + 0.1 * gradient
+                squares[i] = 0.999 * squares[i] + 0.001 * gradient**2
+                corrected_moment = moments[i] / (1 - 0.9**step)
+                corrected_square = squares[i] / (1 - 0.999**step)
+                parameters[i] -= (
+                    learning_rate * corrected_moment / (np.sqrt(corrected_square) + 1e-8)
+                )
+
+        if log is not None:
+            print(
+                f"Epoch {epoch + 1}: training loss {loss(training):.4f}, "
+                f"validation loss {loss(validation) if len(validation) else float('nan'):.4f}",
+                file=log,
+            )
+
+    first_weights, first_biases = parameters[0], parameters[1]
+    layers = [
+        (first_weights / std[:, None], first_biases - (mean / std) @ first_weights)
+    ]
+    layers += [
+        (parameters[i], parameters[i + 1]) for i in range(2, len(parameters), 2)
+    ]
+
+    return LearnedEvaluator(layers), validation
+
+
+def result_accuracy(scores: np.ndarray, results: np.ndarray):
+    """
+    Returns the fraction of positions of decided games whose score favours the winner.
+    """
+    decided = results != 0
+    if not decided.any():
+        return float("nan")
+    return float(np.mean(np.sign(scores[decided]) == results[decided]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Train the learned evaluation of the mill AI."
+    )
+    parser.add_argument(
+        "dataset", help="Labelled positions written by batch_evaluation.py."
+    )
+    parser.add_argument("--model", choices=("linear", "mlp"), default="mlp")
+    parser.add_argument("--hidden", type=int, default=16, help="Hidden layer size.")
+    parser.add_argument("--epochs", type=int, default=30)
+    parser.add_argument("--learning-rate", type=float, default=0.003)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=EVALUATION_PATH)
+    args = parser.parse_args()
+
+    with np.load(args.dataset) as dataset:
+        dataset = dict(dataset)
+    features = batch_features(
+        dataset["positions"], dataset["in_hand"], dataset["side_to_move"]
+    )
+    evaluator, validation = train(
+        features,
+        dataset["results"],
+        dataset["games"],
+        kind=args.model,
+        hidden=args.hidden,
+        epochs=args.epochs,
+        learning_rate=args.learning_rate,
+        seed=args.seed,
+        log=sys.stderr,
+    )
+    evaluator.save(args.output)
+
+    results = dataset["results"][validation]
+    learned = result_accuracy(evaluator.predict(features[validation]), results)
+    hand_tuned = result_accuracy(dataset["scores"][validation], results)
+    print(
+        f"Wrote the {evaluator.kind} model to {args.output}. Validation positions whose score "
+        f"favours the winner: learned {learned:.3f}, hand-tuned {hand_tuned:.3f}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
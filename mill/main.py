@@ -6,7 +6,18 @@ rules [eng]: https://en.wikipedia.org/wiki/Nine_men%27s_morris
 
 Notes:
 - This version of the game does not include a draw condition.
-- There is no possibility to move your checker to non-adjacent fields when left with only 3 checkers.
+- A player left with only 3 checkers may move them to any empty position ("flying").
+- The AI thinks for AI_TIME_BUDGET_MS per move. Set AI_WORKERS to spread its search over several processes
+  and AI_SEED to make its choices between equally good moves repeatable.
+- Set AI_ENGINE to "mcts" to play against the Monte Carlo tree search (`mcts.py`) instead of the minimax search.
+- `opening_book.py` generates the placement-phase opening book the AI plays its first moves from.
+- `tablebase.py` builds endgame tables (e.g. `python tablebase.py 3v3 4v3`), the AI plays covered endgames from them.
+- `server.py` hosts many games against the AI over TCP with line-based JSON messages (see its docstring).
+- `self_play.py` plays batches of headless AI games and writes them to a JSON lines file (see its docstring).
+- `MinimaxSearch(collect_stats=True)` records node counts, cutoffs, table hits, time and principal variation of every iteration in `search.stats` (see `search_stats.py`), the server logs them for slow AI moves.
+- `batch_evaluation.py` scores (N, 24) arrays of positions with NumPy and labels self-play games as datasets (see its docstring).
+- `learned_evaluation.py` trains an evaluation model from labelled self-play positions, set AI_EVALUATION_PATH to let the AI use it.
+- `benchmark.py` measures the engine on a fixed set of positions and compares the results with an earlier run (see its docstring).
 
 ## Setup and Running Instructions:
 
@@ -43,6 +54,17 @@ Notes:
 
    - Make sure the project directory contains the following files:
      - The Python game script (e.g., `main.py`)
+     - The bitboard engine module (`bitboard.py`)
+     - The game state module (`game_state.py`)
+     - The AI search module and its statistics (`search.py`, `search_stats.py`)
+     - The Monte Carlo tree search module (`mcts.py`)
+     - The self-play runner (`self_play.py`)
+     - The game server (`server.py`)
+     - The benchmark suite (`benchmark.py`)
+     - The NumPy batch evaluation and the learned evaluation (`batch_evaluation.py`, `learned_evaluation.py`)
+     - The endgame tablebase module (`tablebase.py`)
+     - The opening book and board symmetry modules (`opening_book.py`, `symmetry.py`)
+     - The transposition table module (`transposition.py`)
      - A `requirements.txt` file (for dependencies like `colorama` and `termcolor`)
 
 ### 5. Navigate to the Project Directory
@@ -70,202 +92,130 @@ Notes:
 """
 
 
-from enum import Enum
 import os
-import random
+from concurrent.futures import ProcessPoolExecutor
 from colorama import init
 from termcolor import colored
 from time import sleep
 
+from bitboard import ADJACENT_MASKS, Board, decode_move, encode_move
+from game_state import GameState, Phase, move_forms_mill
+from learned_evaluation import LearnedEvaluator
+from mcts import MonteCarloTreeSearch
+from opening_book import OPENING_BOOK_PATH, OpeningBook
+from search import DEFAULT_TIME_BUDGET_MS, MinimaxSearch, init_search_worker
+from tablebase import TABLEBASE_DIRECTORY, Tablebase
+from transposition import TranspositionTable
 
-class NodeState(Enum):
-    EMPTY = 0
-    PLAYER1 = 1
-    PLAYER2 = 2
 
+# Time budget of a single AI move, in milliseconds.
+AI_TIME_BUDGET_MS = DEFAULT_TIME_BUDGET_MS
 
-class Node:
-    """
-    Represents a node on the board with a position and neighboring node relationships.
+# Number of worker processes searching the AI's root moves in parallel (1 searches in this process)
+# and the seed used to choose between equally good moves (None for a different game every time).
+AI_WORKERS = 1
+AI_SEED = None
 
-    Attributes:
-    - position: The position of the node on the board (1-24).
-    - horizontal_neighbours_positions: List of positions of horizontally neighboring nodes.
-    - vertical_neighbours_positions: List of positions of vertically neighboring nodes.
-    - state: The current state of the node (EMPTY, PLAYER1, PLAYER2).
-    """
+# The AI's transposition table has 2 ** AI_TABLE_SIZE_BITS slots and keys symmetric positions
+# alike when AI_CANONICAL_POSITIONS is set, in every worker process as well.
+AI_TABLE_SIZE_BITS = 18
+AI_CANONICAL_POSITIONS = True
 
-    state = NodeState.EMPTY
+# Opening book generated with opening_book.py and directory of the endgame tables built with tablebase.py.
+# Positions that are not covered by them are searched.
+AI_OPENING_BOOK_PATH = OPENING_BOOK_PATH
+AI_TABLEBASE_DIRECTORY = TABLEBASE_DIRECTORY
 
-    def __init__(
-        self,
-        position: int,
-        horizontal_neighbours_positions: list[int],
-        vertical_neighbours_positions: list[int],
-    ):
-        """
-        Initializes a Node with its position and neighboring nodes.
-        """
-        self.position = position
-        self.horizontal_neighbours_positions = horizontal_neighbours_positions
-        self.vertical_neighbours_positions = vertical_neighbours_positions
-
-    def __str__(self):
-        """
-        Returns a string representation of the Node, showing its position and color based on its state.
-        """
-        if self.state == NodeState.EMPTY:
-            return str(self.position)
-        else:
-            color = "red" if self.state == NodeState.PLAYER1 else "green"
-            return colored(str(self.position), color)
+# AI engine: "minimax" for the iterative-deepening alpha-beta search, "mcts" for the Monte Carlo tree search.
+AI_ENGINE = "minimax"
+
+# Weights of a learned evaluation trained with learned_evaluation.py, None for the hand-tuned evaluation.
+AI_EVALUATION_PATH = None
+
+
+def format_position(board: Board, point: int):
+    """
+    Returns a string representation of the board point (0-23), showing its position and color based on its state.
+    """
+    state = board.state(point)
+    if state == 0:
+        return str(point + 1)
+    else:
+        color = "red" if state == 1 else "green"
+        return colored(str(point + 1), color)
 
-    def get_matching_neighbour_count(
-        self, horizontal: bool, excluded_neighbour_position: int = None
-    ):
-        """
-        Recursively counts the number of neighboring nodes with the same state, either horizontally or vertically.
-
-        Args:
-        - horizontal: True to check horizontal neighbors, False to check vertical neighbors.
-        - excluded_neighbour_position: The position of the neighboring node to exclude from the check (optional).
-
-        Returns:
-        The count of neighboring nodes with the same state.
-        """
-        sum = 0
-        neighbours_positions = (
-            self.horizontal_neighbours_positions
-            if horizontal
-            else self.vertical_neighbours_positions
-        )
 
-        for position in neighbours_positions:
-            if position is excluded_neighbour_position:
-                continue
-
-            neighbouring_node = board[position - 1]
-
-            if self.state == neighbouring_node.state:
-                sum += 1
-                sum += neighbouring_node.get_matching_neighbour_count(
-                    horizontal, self.position
-                )
-
-        return sum
-
-
-# Initialize the game board with 24 nodes and their respective neighbors.
-board = [
-    Node(1, [2], [10]),
-    Node(2, [1, 3], [5]),
-    Node(3, [2], [15]),
-    Node(4, [5], [11]),
-    Node(5, [4, 6], [2, 8]),
-    Node(6, [5], [14]),
-    Node(7, [8], [12]),
-    Node(8, [7, 9], [5]),
-    Node(9, [8], [13]),
-    Node(10, [11], [1, 22]),
-    Node(11, [10, 12], [4, 19]),
-    Node(12, [11], [7, 16]),
-    Node(13, [14], [9, 18]),
-    Node(14, [13, 15], [6, 21]),
-    Node(15, [14], [3, 24]),
-    Node(16, [17], [12]),
-    Node(17, [16, 18], [20]),
-    Node(18, [17], [13]),
-    Node(19, [20], [11]),
-    Node(20, [19, 21], [17, 23]),
-    Node(21, [20], [14]),
-    Node(22, [23], [10]),
-    Node(23, [22, 24], [20]),
-    Node(24, [23], [15]),
-]
-
-player_1_checkers = 9
-player_2_checkers = 9
-
-
-def get_board_representation():
+def get_board_representation(board: Board):
     """
-    Returns a string representation of the current game board, showing each node's position and state.
+    Returns a string representation of the game board, showing each node's position and state.
     """
+    nodes = [format_position(board, point) for point in range(24)]
     return f"""
-        {board[0]}----------{board[1]}----------{board[2]}
+        {nodes[0]}----------{nodes[1]}----------{nodes[2]}
         |          |          |
-        |   {board[3]}------{board[4]}------{board[5]}   |
+        |   {nodes[3]}------{nodes[4]}------{nodes[5]}   |
         |   |      |      |   |
-        |   |  {board[6]}---{board[7]}---{board[8]}  |   |
+        |   |  {nodes[6]}---{nodes[7]}---{nodes[8]}  |   |
         |   |  |       |  |   |
-        {board[9]}-{board[10]}-{board[11]}       {board[12]}-{board[13]}-{board[14]}
+        {nodes[9]}-{nodes[10]}-{nodes[11]}       {nodes[12]}-{nodes[13]}-{nodes[14]}
         |   |  |       |  |   |
-        |   |  {board[15]}--{board[16]}--{board[17]} |   |
+        |   |  {nodes[15]}--{nodes[16]}--{nodes[17]} |   |
         |   |      |      |   |
-        |   {board[18]}-----{board[19]}-----{board[20]}  |
+        |   {nodes[18]}-----{nodes[19]}-----{nodes[20]}  |
         |          |          |
-        {board[21]}---------{board[22]}---------{board[23]}
+        {nodes[21]}---------{nodes[22]}---------{nodes[23]}
 
 """
 
 
-def put_checker_on_board(player: int):
+def show_board(board: Board):
+    """
+    Clears the terminal and draws the board.
+    """
+    os.system("cls")
+    print(get_board_representation(board))
+
+
+def put_checker_on_board(state: GameState):
     """
     Allows the current player to place a checker on an empty position on the board.
     If the player forms a mill (3 checkers in a row), the player can remove one of the opponent's checkers.
 
     Args:
-    - player: The current player (1 or 2).
+    - state: The game state, the side to move is the current player.
     """
+    player = state.side_to_move
     position = int(
         input(
             f"Player {player}, enter the position (1-24) where you'd like to place your checker: "
         )
     )
 
-    try:
-        node = board[position - 1]
-    except IndexError:
+    if not 1 <= position <= 24:
         print(f"Invalid position {position}. Please enter a number between 1 and 24.")
-        put_checker_on_board(player)
+        put_checker_on_board(state)
         return
 
-    if node.state != NodeState.EMPTY:
+    if state.board.state(position - 1) != 0:
         print(
             f"Position {position} is already occupied. Please choose another position."
         )
-        put_checker_on_board(player)
+        put_checker_on_board(state)
         return
 
-    node.state = NodeState(player)
+    play_human_move(state, encode_move(position - 1))
 
-    os.system("cls")
-    print(get_board_representation())
 
-    if (
-        node.get_matching_neighbour_count(True) == 2
-        or node.get_matching_neighbour_count(False) == 2
-    ):
-        print(f"Player {player}, you scored a point!")
-
-        if player == 1:
-            global player_2_checkers
-            player_2_checkers -= 1
-        else:
-            global player_1_checkers
-            player_1_checkers -= 1
-
-        remove_checker_from_board(player)
-
-
-def move_checker_on_board(player: int):
+def move_checker_on_board(state: GameState):
     """
-    Allows the current player to move one of their checkers to an adjacent empty position on the board.
+    Allows the current player to move one of their checkers to an adjacent empty position on the board,
+    or to any empty position when the player is left with only 3 checkers.
     If the move forms a mill, the player can remove one of the opponent's checkers.
 
     Args:
-    - player: The current player (1 or 2).
+    - state: The game state, the side to move is the current player.
     """
+    player = state.side_to_move
     from_position = int(
         input(f"Player {player}, enter the position of the checker you want to move: ")
     )
@@ -275,373 +225,166 @@ def move_checker_on_board(player: int):
         )
     )
 
-    try:
-        from_node = board[from_position - 1]
-        to_node = board[to_position - 1]
-    except IndexError:
+    if not 1 <= from_position <= 24 or not 1 <= to_position <= 24:
         print(f"Invalid position. Please enter numbers between 1 and 24.")
-        move_checker_on_board(player)
+        move_checker_on_board(state)
         return
 
-    if from_node.state != NodeState(player):
+    if state.board.state(from_position - 1) != player:
         print(f"Invalid move. You can only move your own checker, Player {player}.")
-        move_checker_on_board(player)
+        move_checker_on_board(state)
         return
 
-    if (
-        from_node.position not in to_node.horizontal_neighbours_positions
-        and from_node.position not in to_node.vertical_neighbours_positions
+    if state.phase() != Phase.FLYING and not ADJACENT_MASKS[to_position - 1] & (
+        1 << (from_position - 1)
     ):
         print(
             f"Invalid move. You can only move to a neighboring position. Position {to_position} is not adjacent to position {from_position}."
         )
-        move_checker_on_board(player)
+        move_checker_on_board(state)
         return
 
-    if to_node.state != NodeState.EMPTY:
+    if state.board.state(to_position - 1) != 0:
         print(
             f"Invalid move. Position {to_position} is already occupied. Please choose another position."
         )
-        move_checker_on_board(player)
+        move_checker_on_board(state)
         return
 
-    from_node.state = NodeState.EMPTY
-    to_node.state = NodeState(player)
+    play_human_move(state, encode_move(to_position - 1, from_position - 1))
 
-    os.system("cls")
-    print(get_board_representation())
 
-    if (
-        to_node.get_matching_neighbour_count(True) == 2
-        or to_node.get_matching_neighbour_count(False) == 2
-    ):
+def play_human_move(state: GameState, move: int):
+    """
+    Plays a human player's move. If it forms a mill, the board after the move is shown
+    and the player is asked which of the opponent's checkers to remove.
+    """
+    player = state.side_to_move
+
+    if move_forms_mill(state, move):
+        board = state.board.copy()
+        board.make_move(player, move)
+        show_board(board)
         print(f"Player {player}, you scored a point!")
 
-        if player == 1:
-            global player_2_checkers
-            player_2_checkers -= 1
-        else:
-            global player_1_checkers
-            player_1_checkers -= 1
+        to_point, from_point, _ = decode_move(move)
+        removed_point = remove_checker_from_board(board, player)
+        move = encode_move(to_point, from_point, removed_point)
 
-        remove_checker_from_board(player)
+    state.make_move(move)
+    show_board(state.board)
 
 
-def remove_checker_from_board(player: int):
+def remove_checker_from_board(board: Board, player: int):
     """
-    Allows the current player to remove one of the opponent's checkers after scoring a point.
+    Asks the current player which of the opponent's checkers to remove after scoring a point.
 
     Args:
+    - board: The board after the player's move.
     - player: The current player (1 or 2).
+
+    Returns:
+    The point (0-23) of the checker to remove.
     """
     opponent = 2 if player == 1 else 1
     position = int(
         input(f"Enter the position (1-24) of Player {opponent}'s checker to remove: ")
     )
 
-    try:
-        node = board[position - 1]
-    except IndexError:
+    if not 1 <= position <= 24:
         print(f"Invalid position {position}. Please enter a number between 1 and 24.")
-        remove_checker_from_board(player)
-        return
+        return remove_checker_from_board(board, player)
 
-    if node.state != NodeState(opponent):
+    if board.state(position - 1) != opponent:
         print(
             f"Invalid move. You can only remove Player {opponent}'s checker. Please choose another position."
         )
-        remove_checker_from_board(player)
-        return
-
-    node.state = NodeState.EMPTY
-
-    os.system("cls")
-    print(get_board_representation())
+        return remove_checker_from_board(board, player)
 
+    return position - 1
 
-def evaluate_board():
-    """
-    Evaluates the board state for Player 2 (AI).
-    Gives higher scores for checkers in good positions (near mills, etc.).
-    Returns a positive score if Player 2 is in a better position,
-    negative if Player 1 is in a better position.
-    """
-    player_2_score = 0
-    player_1_score = 0
-
-    for node in board:
-        if node.state == NodeState.PLAYER2:
-            # Add score for Player 2's checkers
-            player_2_score += 1
-
-            # Check if this checker is part of a potential mill
-            if (
-                node.get_matching_neighbour_count(True) == 2
-                or node.get_matching_neighbour_count(False) == 2
-            ):
-                player_2_score += 5  # Higher value for forming or being near a mill
-
-        elif node.state == NodeState.PLAYER1:
-            # Subtract score for Player 1's checkers
-            player_1_score += 1
 
-            # Check if Player 1 is near forming a mill
-            if (
-                node.get_matching_neighbour_count(True) == 2
-                or node.get_matching_neighbour_count(False) == 2
-            ):
-                player_1_score += 5  # Penalize Player 1's strong positions
-
-    # Final evaluation: higher is better for Player 2 (AI)
-    return player_2_score - player_1_score
-
-
-def generate_possible_moves(player: int):
+def ai_play(state: GameState, search: MinimaxSearch | MonteCarloTreeSearch):
     """
-    Generate a list of all possible moves for the current player (placement or movement).
+    AI (Player 2) plays the move chosen by its engine (the minimax search or the Monte Carlo tree search),
+    removing one of Player 1's checkers if the move forms a mill.
     """
-    possible_moves = []
-
-    # For placement phase, find all empty positions
-    for node in board:
-        if node.state == NodeState.EMPTY:
-            possible_moves.append(node.position)
-
-    # Add movement phase logic if needed
+    move = search.choose_move(state)
 
-    return possible_moves
+    if move is None:
+        # The AI cannot move, the turn passes back to Player 1
+        state.side_to_move = 1
+        return
 
+    to_point, from_point, removed_point = decode_move(move)
+    state.make_move(move)
 
-def check_if_mill_formed(position):
-    """
-    Checks if placing a checker at 'position' forms a mill (three in a row).
-    """
-    node = board[position]
-
-    # Check horizontal neighbors
-    horizontal_neighbours = node.horizontal_neighbours_positions
-    if (
-        len(horizontal_neighbours) == 2
-    ):  # Check if this node has two horizontal neighbors
-        if (
-            board[horizontal_neighbours[0] - 1].state == node.state
-            and board[horizontal_neighbours[1] - 1].state == node.state
-        ):
-            return True
-
-    # Check vertical neighbors
-    vertical_neighbours = node.vertical_neighbours_positions
-    if len(vertical_neighbours) == 2:  # Check if this node has two vertical neighbors
-        if (
-            board[vertical_neighbours[0] - 1].state == node.state
-            and board[vertical_neighbours[1] - 1].state == node.state
-        ):
-            return True
-
-    return False
-
-
-def minimax(depth, is_maximizing_player):
-    """
-    Minimax algorithm for AI to evaluate the game tree.
-    - depth: The depth to look ahead (number of moves).
-    - is_maximizing_player: True if it's the maximizing player's turn (AI), False for minimizing player (human).
-    """
-    if depth == 0 or player_1_checkers == 2 or player_2_checkers == 2:
-        return evaluate_board()
-
-    if is_maximizing_player:
-        max_eval = float("-inf")
-        for move in generate_possible_moves(2):  # AI (Player 2) moves
-            board[move - 1].state = NodeState.PLAYER2
-            if check_if_mill_formed(move - 1):  # Check if the move forms a mill
-                eval = 100  # Assign a very high value for forming a mill
-            else:
-                eval = minimax(depth - 1, False)  # Recursively call minimax
-            board[move - 1].state = NodeState.EMPTY  # Undo move
-            max_eval = max(max_eval, eval)
-        return max_eval
-    else:
-        min_eval = float("inf")
-        for move in generate_possible_moves(1):  # Human (Player 1) moves
-            board[move - 1].state = NodeState.PLAYER1
-            if check_if_mill_formed(move - 1):  # Check if the move forms a mill
-                eval = (
-                    -100
-                )  # Assign a very low value for allowing Player 1 to form a mill
-            else:
-                eval = minimax(depth - 1, True)  # Recursively call minimax
-            board[move - 1].state = NodeState.EMPTY  # Undo move
-            min_eval = min(min_eval, eval)
-        return min_eval
-
-
-def ai_place_checker():
-    """
-    AI (Player 2) places the best checker using minimax and removes Player 1's checker if a mill is formed.
-    """
-    best_value = float("-inf")
-    best_moves = []
-
-    # AI evaluates the best possible move for placing a checker
-    for move in generate_possible_moves(2):
-        board[move - 1].state = NodeState.PLAYER2  # Simulate the move
-        move_value = minimax(3, False)  # AI thinks 3 moves ahead
-        board[move - 1].state = NodeState.EMPTY  # Undo the move
-
-        if move_value > best_value:
-            best_value = move_value
-            best_moves = [move]  # Clear and add new best move
-        elif move_value == best_value:
-            best_moves.append(move)  # Add to the list of equally good moves
-
-    # Randomly choose from equally valued moves
-    best_move = random.choice(best_moves)
-
-    # Place the checker in the best position
-    board[best_move - 1].state = NodeState.PLAYER2
-    os.system("cls")
-    print(get_board_representation())
+    if from_point >= 0:
+        print(
+            f"AI moved checker from position {from_point + 1} to position {to_point + 1}"
+        )
+        sleep(1.5)
+    show_board(state.board)
 
-    # Check if AI formed a mill and remove a Player 1's checker
-    node = board[best_move - 1]
-    if (
-        node.get_matching_neighbour_count(True) == 2
-        or node.get_matching_neighbour_count(False) == 2
-    ):
+    # Report the mill and the removed Player 1's checker
+    if removed_point >= 0:
         print("AI scored a point!")
         sleep(1.5)
-        global player_1_checkers
-        player_1_checkers -= 1
-        ai_remove_player_1_checker()  # Call AI's strategic removal function
+        print(f"AI removed Player 1's checker from position {removed_point + 1}")
+        sleep(1.5)
+        show_board(state.board)
 
 
-def ai_move_checker():
+def create_ai(executor: ProcessPoolExecutor = None):
     """
-    AI (Player 2) chooses the best move during the movement phase using the minimax algorithm.
+    Creates the AI engine selected by AI_ENGINE, searching in the worker processes of the executor if one is given.
     """
-    best_move = None
-    best_value = float("-inf")
-
-    # Iterate through all checkers belonging to Player 2
-    for from_node in board:
-        if from_node.state == NodeState.PLAYER2:
-            # Generate possible moves (empty neighboring positions)
-            for to_position in (
-                from_node.horizontal_neighbours_positions
-                + from_node.vertical_neighbours_positions
-            ):
-                to_node = board[to_position - 1]
-                if to_node.state == NodeState.EMPTY:
-                    # Simulate moving the checker
-                    from_node.state = NodeState.EMPTY
-                    to_node.state = NodeState.PLAYER2
-                    move_value = minimax(3, False)  # AI thinks 3 moves ahead
-                    # Undo the move
-                    from_node.state = NodeState.PLAYER2
-                    to_node.state = NodeState.EMPTY
-
-                    # Choose the move with the best evaluation
-                    if move_value > best_value:
-                        best_value = move_value
-                        best_move = (from_node.position, to_node.position)
-
-    # Perform the best move
-    if best_move:
-        from_position, to_position = best_move
-        board[from_position - 1].state = NodeState.EMPTY
-        board[to_position - 1].state = NodeState.PLAYER2
-        print(
-            f"AI moved checker from position {from_position} to position {to_position}"
+    evaluator = (
+        LearnedEvaluator.load(AI_EVALUATION_PATH) if AI_EVALUATION_PATH else None
+    )
+    worker_count = AI_WORKERS if executor is not None else 1
+
+    if AI_ENGINE == "mcts":
+        return MonteCarloTreeSearch(
+            AI_TIME_BUDGET_MS,
+            executor=executor,
+            worker_count=worker_count,
+            seed=AI_SEED,
+            evaluator=evaluator,
         )
-        sleep(1.5)
-        os.system("cls")
-        print(get_board_representation())
-
-        # Check if AI formed a mill after the move
-        to_node = board[to_position - 1]
-        if (
-            to_node.get_matching_neighbour_count(True) == 2
-            or to_node.get_matching_neighbour_count(False) == 2
-        ):
-            print(f"Player 2 (AI) scored a point!")
-            sleep(1.5)
-            global player_1_checkers
-            player_1_checkers -= 1
-            ai_remove_player_1_checker()
-
-
-def ai_remove_player_1_checker():
-    """
-    AI (Player 2) strategically removes one of Player 1's checkers after forming a mill.
-    The priority is to remove checkers that are part of Player 1's potential mills.
-    """
-    # Identify Player 1's checkers on the board
-    player_1_checkers_positions = [
-        node for node in board if node.state == NodeState.PLAYER1
-    ]
-
-    if not player_1_checkers_positions:
-        return  # No more checkers to remove
-
-    # Step 1: Prioritize removing checkers that are part of a potential mill
-    critical_checkers = []
-    vulnerable_checkers = []
-
-    for node in player_1_checkers_positions:
-        horizontal_count = node.get_matching_neighbour_count(True)
-        vertical_count = node.get_matching_neighbour_count(False)
-
-        # Check if Player 1 is close to forming a mill
-        if horizontal_count == 2 or vertical_count == 2:
-            critical_checkers.append(node)
-        elif horizontal_count == 1 or vertical_count == 1:
-            vulnerable_checkers.append(node)
-
-    # Step 2: If there are critical checkers, remove one of them
-    if critical_checkers:
-        node_to_remove = critical_checkers[
-            0
-        ]  # For now, pick the first one (could improve strategy here)
-    elif vulnerable_checkers:
-        # Step 3: If no critical checkers, remove vulnerable ones that could form mills in the future
-        node_to_remove = vulnerable_checkers[0]
-    else:
-        # Step 4: As a last resort, remove any Player 1 checker
-        node_to_remove = player_1_checkers_positions[0]
-
-    # Remove the selected checker
-    board[node_to_remove.position - 1].state = NodeState.EMPTY
-    print(f"AI removed Player 1's checker from position {node_to_remove.position}")
-    sleep(1.5)
-
-    # Refresh the board display
-    os.system("cls")
-    print(get_board_representation())
-
-
-def game():
-    turn = 0
+    return MinimaxSearch(
+        AI_TIME_BUDGET_MS,
+        executor=executor,
+        worker_count=worker_count,
+        seed=AI_SEED,
+        transposition_table=TranspositionTable(AI_TABLE_SIZE_BITS),
+        tablebase=Tablebase(AI_TABLEBASE_DIRECTORY),
+        opening_book=OpeningBook(AI_OPENING_BOOK_PATH),
+        canonical_positions=AI_CANONICAL_POSITIONS,
+        evaluator=evaluator,
+    )
 
-    print(get_board_representation())
 
-    while player_1_checkers != 2 and player_2_checkers != 2:
-        turn += 1
+def game(search: MinimaxSearch | MonteCarloTreeSearch):
+    state = GameState()
 
-        if turn <= 9:
-            put_checker_on_board(1)
-            ai_place_checker()
+    print(get_board_representation(state.board))
 
+    while not state.is_over():
+        if state.phase() == Phase.PLACEMENT:
+            put_checker_on_board(state)
         else:
-            move_checker_on_board(1)
-            ai_move_checker()
+            move_checker_on_board(state)
+
+        if not state.is_over():
+            ai_play(state, search)
 
-    if player_1_checkers == 2:
+    if state.winner() == 2:
         print(
             "Player 2 wins! Player 1 is left with only 2 checkers and cannot make any more moves."
         )
 
-    if player_2_checkers == 2:
+    if state.winner() == 1:
         print(
             "Player 1 wins! Player 2 is left with only 2 checkers and cannot make any more moves."
         )
@@ -649,4 +392,13 @@ def game():
 
 if __name__ == "__main__":
     init()
-    game()
+
+    if AI_WORKERS > 1:
+        with ProcessPoolExecutor(
+            AI_WORKERS,
+            initializer=init_search_worker,
+            initargs=(AI_TABLE_SIZE_BITS, AI_CANONICAL_POSITIONS),
+        ) as executor:
+            game(create_ai(executor))
+    else:
+        game(create_ai())
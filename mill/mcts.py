@@ -0,0 +1,396 @@
+"""
+Monte Carlo tree search for the Nine Men's Morris AI.
+
+An alternative to the minimax search (see ``search.py``) with the same choose_move
+interface. Every iteration walks down the tree choosing children by UCT (the upper
+confidence bound applied to trees), adds one new position, plays the game out with
+random or heuristic moves and backs the result up the path. The search is anytime:
+it stops after a time budget or a number of iterations and plays the most visited move.
+
+Moves are made and taken back on the GameState's bitboards, so an iteration allocates
+nothing but the new tree node. The subtree of the position the game actually reached
+is kept for the next move. With a process pool the root is parallelized: every worker
+grows its own tree for the same time budget and the visits of the root moves are added up.
+
+A playout that reaches its ply limit or a blocked position (the side to move has no move)
+is scored by the sign of the evaluation, like the minimax search scores its leaves.
+"""
+
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from bitboard import MOVE_POINT_MASK, MOVE_REMOVED_SHIFT, completes_mill
+from game_state import GameState, generate_moves
+from search import DEFAULT_TIME_BUDGET_MS, evaluate_board
+
+
+# Exploration constant of UCT, sqrt(2) is the textbook value for results between 0 and 1
+DEFAULT_EXPLORATION = math.sqrt(2)
+# Plies a playout runs before the position is scored by the evaluation
+DEFAULT_ROLLOUT_PLIES = 16
+ROLLOUT_POLICIES = ("random", "heuristic")
+
+
+class Node:
+    """
+    A position of the search tree.
+
+    Attributes:
+    - move: The move leading to the position (None for the root).
+    - player: The player who made the move.
+    - key: Zobrist hash of the position, used to find the tree again on the next move.
+    - children: Expanded child nodes.
+    - untried_moves: Moves of the position without a child node yet.
+    - visits: Number of playouts through the position.
+    - wins: Sum of the playout results from the point of view of the player who made the move.
+    """
+
+    __slots__ = ("move", "player", "key", "children", "untried_moves", "visits", "wins")
+
+    def __init__(self, move, player: int, key: int, untried_moves: list[int]):
+        self.move = move
+        self.player = player
+        self.key = key
+        self.children = []
+        self.untried_moves = untried_moves
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MonteCarloTreeSearch:
+    """
+    UCT search with playouts, tree reuse between moves and optional root parallelization.
+
+    Attributes:
+    - time_budget_ms: Wall-clock time available for a single move, in milliseconds.
+    - iterations: Number of playouts per move, None to only stop at the time budget.
+    - exploration: Exploration constant of UCT.
+    - rollout_policy: "random" plays uniformly random moves, "heuristic" prefers captures
+      and blocking the opponent's mills.
+    - rollout_plies: Number of plies after which a playout is scored by the evaluation.
+    - executor: Process pool to grow independent trees in, None to search in this process.
+    - worker_count: Number of trees grown in the process pool.
+    - evaluator: Evaluation scoring unfinished playouts (see MinimaxSearch), None for evaluate_board.
+    - random: Random generator of the playouts.
+    - root: The node of the position after the last chosen move, kept for tree reuse.
+    - nodes: Number of positions visited so far, in the tree and in the playouts.
+    - last_iterations: Number of playouts of the last chosen move.
+    """
+
+    def __init__(
+        self,
+        time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+        iterations: int = None,
+        exploration: float = DEFAULT_EXPLORATION,
+        rollout_policy: str = "heuristic",
+        rollout_plies: int = DEFAULT_ROLLOUT_PLIES,
+        executor: ProcessPoolExecutor = None,
+        worker_count: int = 1,
+        seed: int = None,
+        evaluator=None,
+    ):
+        if rollout_policy not in ROLLOUT_POLICIES:
+            raise ValueError(f"Unknown rollout policy {rollout_policy!r}")
+
+        self.time_budget_ms = time_budget_ms
+        self.iterations = iterations
+        self.exploration = exploration
+        self.rollout_policy = rollout_policy
+        self.rollout_plies = rollout_plies
+        self.executor = executor
+        self.worker_count = worker_count
+        self.evaluator = evaluator
+        self.random = random.Random(seed)
+        self.root = None
+        self.nodes = 0
+        self.last_iterations = 0
+
+        # Move list reused by every playout ply
+        self.rollout_moves = []
+
+    def settings(self):
+        """
+        Returns the settings a worker process needs to grow the same kind of tree.
+        """
+        return (
+            self.exploration,
+            self.rollout_policy,
+            self.rollout_plies,
+            self.evaluator,
+        )
+
+    def legal_moves(self, state: GameState):
+        """
+        Returns the moves of the side to move, none once the game is over.
+        """
+        if state.is_over():
+            return []
+        return generate_moves(state)
+
+    def result(self, state: GameState):
+        """
+        Scores the end of a playout for Player 2: 1 for a win, 0 for a loss, and for an
+        unfinished game 1, 0.5 or 0 depending on the sign of the evaluation.
+        """
+        winner = state.winner()
+        if winner is not None:
+            return 1.0 if winner == 2 else 0.0
+
+        if self.evaluator is not None:
+            score = self.evaluator.evaluate(state)
+        else:
+            score = evaluate_board(state.board)
+        return 1.0 if score > 0 else 0.0 if score < 0 else 0.5
+
+    def rollout_move(self, state: GameState, moves: list[int]):
+        """
+        Chooses the next move of a playout. The heuristic policy plays a capture when there is one,
+        otherwise it blocks one of the opponent's mills, otherwise it plays a random move.
+        """
+        if self.rollout_policy == "heuristic":
+            captures = [move for move in moves if move >> MOVE_REMOVED_SHIFT]
+            if captures:
+                return self.random.choice(captures)
+
+            opponent_pieces = state.board.pieces[3 - state.side_to_move]
+            blocks = [
+                move
+                for move in moves
+                if completes_mill(opponent_pieces, move & MOVE_POINT_MASK)
+            ]
+            if blocks:
+                return self.random.choice(blocks)
+
+        return self.random.choice(moves)
+
+    def playout(self, state: GameState):
+        """
+        Plays the game out from the position and returns the result for Player 2.
+        The state is restored before returning.
+        """
+        played = []
+        moves = self.rollout_moves
+
+        try:
+            for _ in range(self.rollout_plies):
+                if state.is_over():
+                    break
+                generate_moves(state, moves)
+                if not moves:
+                    break
+                move = self.rollout_move(state, moves)
+                state.make_move(move)
+                played.append(move)
+
+            return self.result(state)
+        finally:
+            self.nodes += len(played)
+            for move in reversed(played):
+                state.unmake_move(move)
+
+    def select_child(self, node: Node):
+        """
+        Returns the child with the highest upper confidence bound.
+        """
+        log_visits = math.log(node.visits)
+        exploration = self.exploration
+
+        return max(
+            node.children,
+            key=lambda child: child.wins / child.visits
+            + exploration * math.sqrt(log_visits / child.visits),
+        )
+
+    def iterate(self, root: Node, state: GameState):
+        """
+        Runs one iteration: selection, expansion, playout and backpropagation.
+        The state must be the root's position, it is restored before returning.
+        """
+        node = root
+        path = [root]
+        played = []
+
+        try:
+            # Selection: descend through fully expanded positions
+            while not node.untried_moves and node.children:
+                node = self.select_child(node)
+                state.make_move(node.move)
+                played.append(node.move)
+                path.append(node)
+
+            # Expansion: add one of the untried moves as a new node
+            if node.untried_moves:
+                moves = node.untried_moves
+                index = self.random.randrange(len(moves))
+                move = moves[index]
+                moves[index] = moves[-1]
+                moves.pop()
+
+                player = state.side_to_move
+                state.make_move(move)
+                played.append(move)
+                child = Node(move, player, state.key(), self.legal_moves(state))
+                node.children.append(child)
+                path.append(child)
+
+            self.nodes += len(played)
+            result = self.playout(state)
+        finally:
+            for move in reversed(played):
+                state.unmake_move(move)
+
+        # Backpropagation
+        for node in path:
+            node.visits += 1
+            node.wins += result if node.player == 2 else 1.0 - result
+
+    def find_root(self, state: GameState):
+        """
+        Returns the kept node of the position if the game reached a position of the kept tree
+        within two plies, otherwise a new root node.
+        """
+        key = state.key()
+        if self.root is not None:
+            nodes = [self.root]
+            for _ in range(3):
+                for node in nodes:
+                    if node.key == key:
+                        return node
+                nodes = [child for node in nodes for child in node.children]
+
+        return Node(None, 3 - state.side_to_move, key, self.legal_moves(state))
+
+    def grow(self, root: Node, state: GameState, time_budget_ms: float, iterations: int):
+        """
+        Runs iterations from the root until the time budget or the iteration count is spent.
+
+        Returns:
+        The number of iterations run.
+        """
+        deadline = perf_counter() + time_budget_ms / 1000
+        count = 0
+
+        while iterations is None or count < iterations:
+            self.iterate(root, state)
+            count += 1
+            if perf_counter() > deadline:
+                break
+
+        return count
+
+    def root_statistics(self, state: GameState, time_budget_ms: float, iterations: int):
+        """
+        Grows the tree of the position and returns the (move, visits, wins) of every root move.
+
+        Only the visits and wins added by this call are counted: a reused tree already holds those
+        of earlier calls, which another call for the same position may have reported already.
+        """
+        root = self.find_root(state)
+        before = {child.move: (child.visits, child.wins) for child in root.children}
+        self.last_iterations = self.grow(root, state, time_budget_ms, iterations)
+        self.root = root
+
+        statistics = []
+        for child in root.children:
+            visits, wins = before.get(child.move, (0, 0))
+            statistics.append((child.move, child.visits - visits, child.wins - wins))
+        return statistics
+
+    def choose_move(self, state: GameState):
+        """
+        Chooses the move of the side to move, including the checker to remove when the move forms a mill.
+
+        Returns:
+        The encoded move, or None if the side to move cannot move.
+        """
+        root = self.find_root(state)
+        if not root.untried_moves and not root.children:
+            return None
+
+        if self.executor is not None:
+            return self.parallel_choose_move(state)
+
+        self.root = root
+        self.last_iterations = self.grow(
+            root, state, self.time_budget_ms, self.iterations
+        )
+        best = max(root.children, key=lambda child: child.visits)
+
+        # Keep the subtree of the chosen move, the opponent's reply is looked up in it next time
+        self.root = best
+        return best.move
+
+    def parallel_choose_move(self, state: GameState):
+        """
+        Grows one tree per worker process for the time budget and plays the move
+        with the most visits over all trees.
+
+        The result is not deterministic under a time budget, even with a fixed seed: the number
+        of playouts depends on the speed of the workers and on which worker runs which task.
+        """
+        iterations = None
+        if self.iterations is not None:
+            iterations = max(1, self.iterations // self.worker_count)
+
+        futures = [
+            self.executor.submit(
+                mcts_worker,
+                state,
+                self.time_budget_ms,
+                iterations,
+                self.random.getrandbits(32),
+                self.settings(),
+            )
+            for _ in range(self.worker_count)
+        ]
+
+        visits = {}
+        self.last_iterations = 0
+        for future in futures:
+            statistics, worker_iterations, nodes = future.result()
+            self.last_iterations += worker_iterations
+            self.nodes += nodes
+            for move, move_visits, _ in statistics:
+                visits[move] = visits.get(move, 0) + move_visits
+
+        return max(visits, key=visits.get)
+
+
+# Search instance of a worker process, kept between tasks so that its tree is reused
+_worker_mcts = None
+
+
+def mcts_worker(
+    state: GameState, time_budget_ms: float, iterations: int, seed: int, settings: tuple
+):
+    """
+    Grows a tree of the position inside a worker process.
+
+    Args:
+    - state: The position to search.
+    - time_budget_ms: Time budget of the search, in milliseconds.
+    - iterations: Number of playouts, None to only stop at the time budget.
+    - seed: Seed of the playouts.
+    - settings: Settings of the searching process (see MonteCarloTreeSearch.settings).
+
+    Returns:
+    The (move, visits, wins) this call added to every root move, the number of iterations
+    and of visited positions.
+    """
+    global _worker_mcts
+    if _worker_mcts is None or _worker_mcts.settings() != settings:
+        exploration, rollout_policy, rollout_plies, evaluator = settings
+        _worker_mcts = MonteCarloTreeSearch(
+            exploration=exploration,
+            rollout_policy=rollout_policy,
+            rollout_plies=rollout_plies,
+            evaluator=evaluator,
+        )
+
+    search = _worker_mcts
+    search.random.seed(seed)
+    nodes = search.nodes
+    statistics = search.root_statistics(state, time_budget_ms, iterations)
+    return statistics, search.last_iterations, search.nodes - nodes
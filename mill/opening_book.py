@@ -0,0 +1,215 @@
+"""
+Opening book for the placement phase of Nine Men's Morris.
+
+The book is generated offline by searching every position of the first plies deeply
+and stores the best move of each of them, so the AI can play the opening without
+searching. Positions are stored from the side to move's point of view and in their
+symmetry-canonical form (see ``symmetry.py``), so one entry serves all 16 symmetric
+positions and both players.
+
+Every entry also records the depth its move was searched to. A book move only replaces
+the search when it was searched deeper than the search would get by itself: the
+MinimaxSearch ignores entries shallower than its min_book_depth. Within the default
+one second budget the search reaches depth 6-7 in the opening, so the book is searched
+to depth 9 by default. That takes about 25 seconds per position on one core, about
+20 minutes for the 51 positions of the first 3 plies (4 plies hold 479 positions).
+
+The file holds a short header followed by the sorted 64-bit position keys, the
+16-bit moves and the 8-bit search depths of the canonical positions. It is looked up
+with a binary search. Books written before the depths were recorded load with depth 0.
+
+Usage:
+    python opening_book.py --plies 3 --max-depth 9 --output opening_book.bin
+"""
+
+import argparse
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from game_state import GameState, Phase, generate_moves
+from search import MIN_BOOK_DEPTH, MinimaxSearch
+from symmetry import INVERSES, canonical, transform_move
+
+
+OPENING_BOOK_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "opening_book.bin"
+)
+BOOK_MAGIC = b"MILLBOK2"
+# Books without search depths
+BOOK_MAGIC_V1 = b"MILLBOOK"
+HEADER = struct.Struct("<8sI")
+
+
+def position_key(state: GameState):
+    """
+    Returns the book key of the position and the symmetry mapping the position to its canonical form.
+    The key combines the canonical bitboards with the checkers both sides still have in hand.
+    """
+    player = state.side_to_move
+    pieces, symmetry = canonical(
+        state.board.pieces[player], state.board.pieces[3 - player]
+    )
+    key = pieces | state.in_hand[player] << 48 | state.in_hand[3 - player] << 52
+    return key, symmetry
+
+
+class OpeningBook:
+    """
+    Sorted table of canonical placement positions and their best moves.
+
+    Attributes:
+    - keys: Position keys in ascending order.
+    - moves: The best move of every position, in the canonical position's orientation.
+    - depths: The depth every move was searched to.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        Loads the book from the file, a missing file gives an empty book.
+        """
+        self.keys = array("Q")
+        self.moves = array("H")
+        self.depths = array("B")
+
+        if path is not None and os.path.exists(path):
+            with open(path, "rb") as file:
+                magic, count = HEADER.unpack(file.read(HEADER.size))
+                if magic not in (BOOK_MAGIC, BOOK_MAGIC_V1):
+                    raise ValueError(f"{path} is not an opening book")
+                self.keys.frombytes(file.read(count * self.keys.itemsize))
+                self.moves.frombytes(file.read(count * self.moves.itemsize))
+                if magic == BOOK_MAGIC:
+                    self.depths.frombytes(file.read(count))
+                else:
+                    self.depths = array("B", bytes(count))
+            if sys.byteorder == "big":
+                self.keys.byteswap()
+                self.moves.byteswap()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, state: GameState, min_depth: int = 0):
+        """
+        Returns the book move for the position, or None if the position is not in the book
+        or its move was searched shallower than min_depth.
+        """
+        if state.phase() != Phase.PLACEMENT:
+            return None
+
+        key, symmetry = position_key(state)
+        index = bisect_left(self.keys, key)
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        if self.depths[index] < min_depth:
+            return None
+
+        return transform_move(self.moves[index], INVERSES[symmetry])
+
+    def save(self, path: str, entries: dict):
+        """
+        Replaces the book with the {key: (canonical move, search depth)} entries and writes it to the file.
+        """
+        self.keys = array("Q", sorted(entries))
+        self.moves = array("H", (entries[key][0] for key in self.keys))
+        self.depths = array("B", (entries[key][1] for key in self.keys))
+
+        keys, moves = self.keys, self.moves
+        if sys.byteorder == "big":
+            keys, moves = array("Q", keys), array("H", moves)
+            keys.byteswap()
+            moves.byteswap()
+
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(BOOK_MAGIC, len(keys)))
+            file.write(keys.tobytes())
+            file.write(moves.tobytes())
+            file.write(self.depths.tobytes())
+
+
+def generate_book(plies: int, search: MinimaxSearch, log=None):
+    """
+    Searches every distinct position of the first plies of the game.
+
+    Args:
+    - plies: Number of plies from the start of the game the book covers.
+    - search: The search choosing the moves, it should not use a book itself and has to
+      collect statistics, which give the depth every move was searched to.
+    - log: Text file to report the progress to (optional).
+
+    Returns:
+    The {key: (canonical move, search depth)} entries of the book.
+    """
+    entries = {}
+    frontier = {position_key(GameState())[0]: GameState()}
+
+    for ply in range(plies):
+        next_frontier = {}
+        for key, state in frontier.items():
+            move = search.choose_move(state)
+            if move is None:
+                continue
+            entries[key] = (
+                transform_move(move, position_key(state)[1]),
+                search.stats.completed_depth,
+            )
+
+            for child_move in generate_moves(state):
+                child = state.copy()
+                child.make_move(child_move)
+                if child.phase() == Phase.PLACEMENT and not child.is_over():
+                    next_frontier.setdefault(position_key(child)[0], child)
+
+        if log is not None:
+            print(f"Ply {ply + 1}: {len(frontier)} positions searched", file=log)
+        frontier = next_frontier
+
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate the opening book of the mill AI."
+    )
+    parser.add_argument(
+        "--plies", type=int, default=3, help="Number of plies the book covers."
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=9,
+        help="Search depth of every book move, it should be deeper than MIN_BOOK_DEPTH of search.py.",
+    )
+    parser.add_argument(
+        "--time-budget-ms",
+        type=int,
+        default=600000,
+        help="Time limit of every book move, the search usually stops at --max-depth first.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed used to choose between equally good moves.",
+    )
+    parser.add_argument("--output", default=OPENING_BOOK_PATH)
+    args = parser.parse_args()
+
+    if args.max_depth < MIN_BOOK_DEPTH:
+        print(
+            f"Warning: moves searched shallower than {MIN_BOOK_DEPTH} are ignored by the AI",
+            file=sys.stderr,
+        )
+    search = MinimaxSearch(
+        args.time_budget_ms, args.max_depth, seed=args.seed, collect_stats=True
+    )
+    entries = generate_book(args.plies, search, sys.stderr)
+    OpeningBook().save(args.output, entries)
+    print(f"Wrote {len(entries)} positions to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
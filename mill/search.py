@@ -0,0 +1,716 @@
+"""
+Minimax search for the Nine Men's Morris AI.
+
+The search runs on a GameState (see ``game_state.py``) and keeps all of its own
+bookkeeping (transposition table, killer moves, history scores and the clock)
+inside a MinimaxSearch instance, so every game can have its own AI.
+Scores are always given from Player 2's point of view: Player 2 maximizes, Player 1 minimizes.
+
+Created with collect_stats=True, the search records the statistics of every chosen move
+(see ``search_stats.py``) and can log its progress during long searches.
+"""
+
+import random
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+from time import perf_counter
+
+from bitboard import (
+    MOVE_FROM_SHIFT,
+    MOVE_POINT_MASK,
+    MOVE_REMOVED_SHIFT,
+    POINT_MILL_MASKS,
+    Board,
+    format_move,
+    mills_through,
+)
+from game_state import GameState, Phase, generate_moves
+from search_stats import IterationStats, SearchStats, logger
+from symmetry import INVERSES, stabilizer, transform_move, unique_moves
+from tablebase import Tablebase
+from transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+
+DEFAULT_TIME_BUDGET_MS = 1000
+MAX_SEARCH_DEPTH = 24
+
+# Opening book moves searched shallower than this are ignored and the position is searched,
+# within the default time budget the search itself reaches depth 6-7 in the opening.
+MIN_BOOK_DEPTH = 8
+
+# Score of a game won at the root, far beyond any evaluation of a running game. A game won
+# n plies below the root scores WIN_SCORE - n, so the search prefers the fastest win and the
+# slowest loss. Scores beyond WON_SCORE_LIMIT (in either sign) are won or lost games.
+WIN_SCORE = 1000
+WON_SCORE_LIMIT = WIN_SCORE // 2
+
+# The clock is only read every TIME_CHECK_INTERVAL searched positions.
+TIME_CHECK_INTERVAL = 256
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside minimax when the time budget of the current AI move is spent.
+    """
+
+
+def evaluate_board(board: Board):
+    """
+    Evaluates the board state for Player 2.
+    Every checker is worth one point and checkers that are part of a mill are worth five more.
+    Returns a positive score if Player 2 is in a better position,
+    negative if Player 1 is in a better position.
+    """
+    return board.evaluate()
+
+
+def score_to_table(value, ply: int):
+    """
+    Converts a score found ply plies below the root into the score stored in the transposition
+    table, where won and lost games count their plies from the stored position.
+    """
+    if value > WON_SCORE_LIMIT:
+        return value + ply
+    if value < -WON_SCORE_LIMIT:
+        return value - ply
+    return value
+
+
+def score_from_table(value, ply: int):
+    """
+    Converts a score stored in the transposition table back into a score counted from the root,
+    for the position found ply plies below it.
+    """
+    if value > WON_SCORE_LIMIT:
+        return value - ply
+    if value < -WON_SCORE_LIMIT:
+        return value + ply
+    return value
+
+
+def capture_priority(opponent_pieces: int, point: int):
+    """
+    Rates removing the opponent's checker on 'point' (0-23) for move ordering.
+    Checkers that are part of the opponent's mills (3) or potential mills (2) come first.
+    """
+    first, second = mills_through(point)
+    return max(
+        (opponent_pieces & first).bit_count(), (opponent_pieces & second).bit_count()
+    )
+
+
+class MinimaxSearch:
+    """
+    Iterative-deepening alpha-beta search with a transposition table and move ordering.
+
+    Attributes:
+    - time_budget_ms: Wall-clock time available for a single move, in milliseconds.
+    - max_depth: The deepest search to try.
+    - executor: Process pool to search the root moves in parallel, None to search in this process.
+    - worker_count: Number of shares the root moves are split into for the process pool.
+    - random: Random generator used to choose between equally good moves.
+    - transposition_table: Positions searched so far, shared by all root moves of a turn.
+    - opening_book: OpeningBook (see ``opening_book.py``) consulted before searching a placement-phase position, None to always search.
+    - min_book_depth: Book moves searched shallower than this depth are ignored.
+    - canonical_positions: Whether the transposition table keys positions by their symmetry-canonical hash,
+      so that symmetric positions share their entries.
+    - tablebase: Endgame tables probed before searching a movement-phase position, None to always search.
+    - evaluator: Evaluation of the leaf positions with an evaluate(state) method, such as a LearnedEvaluator
+      (see ``learned_evaluation.py``), None for the hand-tuned evaluate_board.
+    - nodes: Number of positions searched so far, including those of worker processes in completed parallel iterations.
+    - cutoffs: Number of beta cutoffs so far, counted like nodes.
+    - collect_stats: Whether the statistics of every chosen move are recorded.
+    - stats: SearchStats of the last chosen move when collecting statistics, otherwise None.
+    - progress_interval_s: Seconds between progress log messages of a running search (when collecting statistics),
+      None to only log finished iterations.
+    """
+
+    def __init__(
+        self,
+        time_budget_ms: int = DEFAULT_TIME_BUDGET_MS,
+        max_depth: int = MAX_SEARCH_DEPTH,
+        executor: ProcessPoolExecutor = None,
+        worker_count: int = 1,
+        seed: int = None,
+        transposition_table: TranspositionTable = None,
+        tablebase: Tablebase = None,
+        opening_book=None,
+        min_book_depth: int = MIN_BOOK_DEPTH,
+        canonical_positions: bool = True,
+        evaluator=None,
+        collect_stats: bool = False,
+        progress_interval_s: float = None,
+    ):
+        self.time_budget_ms = time_budget_ms
+        self.max_depth = max_depth
+        self.executor = executor
+        self.worker_count = worker_count
+        self.random = random.Random(seed)
+        self.transposition_table = (
+            transposition_table
+            if transposition_table is not None
+            else TranspositionTable()
+        )
+        self.tablebase = tablebase
+        self.opening_book = opening_book
+        self.min_book_depth = min_book_depth
+        self.canonical_positions = canonical_positions
+        self.evaluator = evaluator
+
+        # Killer moves (moves that caused a cutoff) per remaining search depth
+        # and history scores per player, both used to order moves.
+        self.killer_moves = {}
+        self.history_scores = [None, {}, {}]
+
+        self.deadline = None
+        self.nodes_until_time_check = TIME_CHECK_INTERVAL
+        self.nodes = 0
+        self.cutoffs = 0
+
+        self.collect_stats = collect_stats
+        self.progress_interval_s = progress_interval_s
+        self.stats = None
+        # Positions searched per ply of the running iteration, counted when collecting statistics
+        self.ply_nodes = None
+        self.root_depth = 0
+        self.search_start = None
+        self.iteration_start_nodes = 0
+        self.next_progress_log = None
+
+        # One move list per remaining depth, refilled by the move generator instead of allocating new lists
+        self.move_lists = [[] for _ in range(max_depth + 1)]
+
+    def evaluate(self, state: GameState):
+        """
+        Evaluates a position for Player 2 with the search's evaluator.
+        """
+        if self.evaluator is not None:
+            return self.evaluator.evaluate(state)
+        # Same as evaluate_board, read directly as most searched positions are leaves
+        return state.board.score
+
+    def reset_move_ordering(self):
+        """
+        Clears the killer moves and history scores collected during the previous AI turn.
+        """
+        self.killer_moves.clear()
+        self.history_scores[1].clear()
+        self.history_scores[2].clear()
+
+    def order_moves(self, state: GameState, moves: list[int], depth: int, hash_move=None):
+        """
+        Orders moves in place so that the alpha-beta search finds cutoffs early:
+        the best move stored in the transposition table first, then mill-forming moves (by the checker they remove),
+        then moves blocking an opponent's mill, then killer moves and finally the rest by their history score.
+
+        Args:
+        - state: The position the moves are made in.
+        - moves: Encoded moves of the side to move.
+        - depth: The remaining search depth, used to look up killer moves.
+        - hash_move: The best move stored in the transposition table for this position (optional).
+        """
+        player = state.side_to_move
+        own_pieces = state.board.pieces[player]
+        opponent_pieces = state.board.pieces[3 - player]
+        killers = self.killer_moves.get(depth, ())
+        history = self.history_scores[player]
+
+        def move_priority(move):
+            if move == hash_move:
+                return (4, 0)
+
+            # The mill tests of completes_mill, written out as this runs for every generated move
+            to_point = move & MOVE_POINT_MASK
+            from_point = (move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK
+            to_bit = 1 << to_point
+            first, second = POINT_MILL_MASKS[to_point]
+            pieces = own_pieces | to_bit
+            if from_point:
+                pieces ^= 1 << (from_point - 1)
+
+            if pieces & first == first or pieces & second == second:
+                return (3, capture_priority(opponent_pieces, (move >> MOVE_REMOVED_SHIFT) - 1))
+            pieces = opponent_pieces | to_bit
+            if pieces & first == first or pieces & second == second:
+                return (2, 0)
+            if move in killers:
+                return (1, 0)
+            return (0, history.get(move, 0))
+
+        moves.sort(key=move_priority, reverse=True)
+        return moves
+
+    def record_cutoff(self, player: int, move: int, depth: int):
+        """
+        Remembers a move that caused a beta cutoff as a killer move and raises its history score.
+        """
+        killers = self.killer_moves.setdefault(depth, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+
+        history = self.history_scores[player]
+        history[move] = history.get(move, 0) + depth * depth
+
+    def minimax(
+        self, state: GameState, depth: int, alpha=float("-inf"), beta=float("inf")
+    ):
+        """
+        Minimax algorithm with alpha-beta pruning for AI to evaluate the game tree.
+        Player 2 is the maximizing player, Player 1 the minimizing one.
+
+        Args:
+        - state: The position to evaluate, it is restored before returning.
+        - depth: The depth to look ahead (number of moves).
+        - alpha: The score the maximizing player is already assured of.
+        - beta: The score the minimizing player is already assured of.
+
+        Returns the exact score when it lies between alpha and beta, otherwise a bound
+        on the wrong side of the window (at most alpha or at least beta).
+        """
+        self.nodes += 1
+        ply = self.root_depth - depth
+        if self.ply_nodes is not None:
+            self.ply_nodes[ply] += 1
+        if state.is_over():
+            # Faster wins score higher, slower losses lower
+            return WIN_SCORE - ply if state.winner() == 2 else ply - WIN_SCORE
+        if depth == 0:
+            return self.evaluate(state)
+
+        # Give up the search once the time budget is spent
+        if self.deadline is not None:
+            self.nodes_until_time_check -= 1
+            if self.nodes_until_time_check <= 0:
+                self.nodes_until_time_check = TIME_CHECK_INTERVAL
+                now = perf_counter()
+                if now > self.deadline:
+                    raise SearchTimeout()
+                if self.next_progress_log is not None and now >= self.next_progress_log:
+                    self.log_progress(now)
+
+        player = state.side_to_move
+        if depth >= len(self.move_lists):
+            self.move_lists.extend([] for _ in range(depth + 1 - len(self.move_lists)))
+        possible_moves = generate_moves(state, self.move_lists[depth])
+        if not possible_moves:
+            return self.evaluate(state)
+
+        # Look the position up in the transposition table
+        if self.canonical_positions:
+            key, symmetry = state.canonical_key()
+        else:
+            key, symmetry = state.key(), 0
+        entry = self.transposition_table.probe(key)
+        hash_move = None
+
+        if entry is not None:
+            _, entry_depth, bound, value, hash_move, _ = entry
+            value = score_from_table(value, ply)
+            if entry_depth >= depth and (
+                bound == EXACT
+                or (bound == LOWER_BOUND and value >= beta)
+                or (bound == UPPER_BOUND and value <= alpha)
+            ):
+                return value
+            if symmetry and hash_move is not None:
+                # Stored moves belong to the canonical position
+                hash_move = transform_move(hash_move, INVERSES[symmetry])
+
+        original_alpha, original_beta = alpha, beta
+        is_maximizing_player = player == 2
+        best_eval = float("-inf") if is_maximizing_player else float("inf")
+        best_move = None
+
+        # Mill-forming moves come with their capture, so every capture is searched like any other move
+        for move in self.order_moves(state, possible_moves, depth, hash_move):
+            state.make_move(move)
+            try:
+                eval = self.minimax(state, depth - 1, alpha, beta)
+            finally:
+                state.unmake_move(move)  # Undo move, also when the search times out
+
+            if is_maximizing_player:
+                if eval > best_eval:
+                    best_eval = eval
+                    best_move = move
+                alpha = max(alpha, eval)
+            else:
+                if eval < best_eval:
+                    best_eval = eval
+                    best_move = move
+                beta = min(beta, eval)
+
+            if alpha >= beta:  # The opponent will never allow this line
+                self.cutoffs += 1
+                self.record_cutoff(player, move, depth)
+                break
+
+        # Remember what kind of score was found for the position
+        if best_eval <= original_alpha:
+            bound = UPPER_BOUND
+        elif best_eval >= original_beta:
+            bound = LOWER_BOUND
+        else:
+            bound = EXACT
+        if symmetry and best_move is not None:
+            best_move = transform_move(best_move, symmetry)
+        self.transposition_table.store(
+            key, depth, bound, score_to_table(best_eval, ply), best_move
+        )
+
+        return best_eval
+
+    def search_root(self, state: GameState, root_moves: list[int], depth: int):
+        """
+        Searches every root move of the side to move to the given depth.
+
+        Moves worse than the best one found so far are only searched with a narrow window.
+        The best score is the one plain minimax finds at the same depth. The list of moves
+        reaching it is not guaranteed to be the plain search's: bounds reused from the
+        transposition table can make a move look equal to the best one or hide it.
+
+        Returns:
+        The best score and the list of all root moves reaching it, in search order.
+        """
+        is_maximizing_player = state.side_to_move == 2
+        best_value = float("-inf") if is_maximizing_player else float("inf")
+        best_moves = []
+        self.root_depth = depth
+
+        for move in root_moves:
+            state.make_move(move)  # Simulate the move
+            try:
+                if is_maximizing_player:
+                    move_value = self.minimax(state, depth - 1, best_value - 1)
+                else:
+                    move_value = self.minimax(
+                        state, depth - 1, float("-inf"), best_value + 1
+                    )
+            finally:
+                state.unmake_move(move)  # Undo the move
+
+            if move_value == best_value:
+                best_moves.append(move)  # Add to the list of equally good moves
+            elif (move_value > best_value) == is_maximizing_player:
+                best_value = move_value
+                best_moves = [move]  # Clear and add new best move
+
+        return best_value, best_moves
+
+    def parallel_search_root(self, state: GameState, root_moves: list[int], depth: int):
+        """
+        Searches the root moves to the given depth, split round-robin between the worker processes.
+
+        Every share returns exact scores for its best moves, so the overall best moves are
+        the shares' best moves reaching the overall best score. They are returned in root
+        move order, which keeps the result of a completed iteration independent of the order
+        the workers finish in. Which iterations complete within the time budget still depends
+        on the speed of the workers, so the chosen move is not reproducible even with a fixed seed.
+
+        The worker processes should be started with init_search_worker, so that their searches
+        use the same transposition table size and position keys as this one.
+
+        Raises SearchTimeout when the time budget runs out before all workers are done.
+        """
+        shares = [root_moves[i :: self.worker_count] for i in range(self.worker_count)]
+        time_left_ms = (self.deadline - perf_counter()) * 1000
+        futures = [
+            self.executor.submit(
+                search_root_worker, state, share, depth, time_left_ms, self.evaluator
+            )
+            for share in shares
+            if share
+        ]
+
+        done, not_done = wait(
+            futures, timeout=max(time_left_ms, 0) / 1000, return_when=FIRST_EXCEPTION
+        )
+        results = [future.result() for future in done]
+        if not_done or None in results:
+            # Shares not started yet are dropped, running ones stop at their own deadline
+            for future in not_done:
+                future.cancel()
+            raise SearchTimeout()
+
+        values = [value for value, _, _ in results]
+        best_value = max(values) if state.side_to_move == 2 else min(values)
+        best_moves = set()
+        for value, moves, (nodes, cutoffs) in results:
+            self.nodes += nodes
+            self.cutoffs += cutoffs
+            if value == best_value:
+                best_moves.update(moves)
+
+        return best_value, [move for move in root_moves if move in best_moves]
+
+    def iterative_deepening(
+        self,
+        state: GameState,
+        root_moves: list[int],
+        time_budget_ms: int = None,
+        max_depth: int = None,
+    ):
+        """
+        Searches the root moves one ply deeper at a time until the time budget is spent.
+
+        The search that runs out of time is abandoned, the result of the last completed depth is returned.
+        Every iteration starts with the best moves of the previous one, while the principal variation
+        below them is replayed first from the best moves stored in the transposition table.
+        The first iteration always completes, so there is a move to play even with a tiny budget.
+
+        Args:
+        - state: The position to search, it is restored before returning.
+        - root_moves: Encoded moves of the side to move to choose from.
+        - time_budget_ms: Wall-clock time available for the move, in milliseconds (defaults to the instance's budget).
+        - max_depth: The deepest search to try (defaults to the instance's maximum).
+
+        Returns:
+        The best score, the list of equally good best moves and the depth that was completed.
+        """
+        if time_budget_ms is None:
+            time_budget_ms = self.time_budget_ms
+        if max_depth is None:
+            max_depth = self.max_depth
+
+        start = perf_counter()
+        self.reset_move_ordering()
+        self.transposition_table.new_search()
+        if self.collect_stats:
+            self.stats = SearchStats("search", len(root_moves))
+            self.search_start = start
+
+        best_value, best_moves = self.search_iteration(state, root_moves, 1)
+        completed_depth = 1
+
+        self.deadline = start + time_budget_ms / 1000
+        self.nodes_until_time_check = TIME_CHECK_INTERVAL
+        if self.collect_stats and self.progress_interval_s is not None:
+            self.next_progress_log = start + self.progress_interval_s
+        try:
+            for depth in range(2, max_depth + 1):
+                if perf_counter() > self.deadline:
+                    break
+
+                # Search the previous iteration's best moves first
+                root_moves = best_moves + [
+                    move for move in root_moves if move not in best_moves
+                ]
+                try:
+                    best_value, best_moves = self.search_iteration(
+                        state, root_moves, depth
+                    )
+                except SearchTimeout:
+                    break
+                completed_depth = depth
+        finally:
+            self.deadline = None
+            self.next_progress_log = None
+
+        if self.collect_stats:
+            self.stats.seconds = perf_counter() - start
+            logger.debug("Search finished: %s", self.stats)
+
+        return best_value, best_moves, completed_depth
+
+    def search_iteration(self, state: GameState, root_moves: list[int], depth: int):
+        """
+        Runs one iteration of the iterative deepening, in the worker processes when there
+        is a process pool (except for the first, quick iteration). When collecting
+        statistics, they are recorded even if the iteration runs out of time.
+
+        Returns:
+        The best score and the list of all root moves reaching it.
+        """
+        if self.executor is None or depth == 1:
+            search = self.search_root
+        else:
+            search = self.parallel_search_root
+
+        if not self.collect_stats:
+            return search(state, root_moves, depth)
+
+        iteration = IterationStats(depth)
+        self.stats.iterations.append(iteration)
+        table = self.transposition_table
+        start = perf_counter()
+        nodes, cutoffs = self.nodes, self.cutoffs
+        hits, probes = table.hits, table.hits + table.misses
+        self.ply_nodes = [0] * (depth + 1)
+        self.ply_nodes[0] = 1
+        self.iteration_start_nodes = nodes
+
+        try:
+            best_value, best_moves = search(state, root_moves, depth)
+            iteration.completed = True
+            iteration.value = best_value
+            iteration.best_moves = best_moves
+            iteration.principal_variation = self.principal_variation(
+                state, best_moves[0], depth
+            )
+        finally:
+            iteration.seconds = perf_counter() - start
+            iteration.nodes = self.nodes - nodes
+            iteration.cutoffs = self.cutoffs - cutoffs
+            iteration.table_hits = table.hits - hits
+            iteration.table_probes = table.hits + table.misses - probes
+            iteration.ply_nodes = self.ply_nodes
+            self.ply_nodes = None
+            logger.debug("Iteration %s", iteration)
+
+        return best_value, best_moves
+
+    def principal_variation(self, state: GameState, first_move: int, depth: int):
+        """
+        Returns the expected line of play: the first move followed by the best moves
+        stored in the transposition table, up to the given depth.
+        The line ends early where the table lost its entry or the stored move is not legal.
+        """
+        line = [first_move]
+        state = state.copy()
+        state.make_move(first_move)
+
+        while len(line) < depth and not state.is_over():
+            if self.canonical_positions:
+                key, symmetry = state.canonical_key()
+            else:
+                key, symmetry = state.key(), 0
+            table = self.transposition_table
+            entry = table.entries[key & table.mask]
+            if entry is None or entry[0] != key or entry[4] is None:
+                break
+            move = entry[4]
+            if symmetry:
+                move = transform_move(move, INVERSES[symmetry])
+            if move not in generate_moves(state):
+                break
+            line.append(move)
+            state.make_move(move)
+
+        return line
+
+    def log_progress(self, now: float):
+        """
+        Logs the progress of the running iteration and schedules the next progress message.
+        """
+        iteration = self.stats.iterations[-1]
+        best_line = self.stats.principal_variation
+        logger.info(
+            "Searching depth %d, %.0f ms since the start: "
+            "%d nodes in this iteration, best move so far %s",
+            iteration.depth,
+            (now - self.search_start) * 1000,
+            self.nodes - self.iteration_start_nodes,
+            format_move(best_line[0]) if best_line else "-",
+        )
+        self.next_progress_log = now + self.progress_interval_s
+
+    def root_moves(self, state: GameState):
+        """
+        Returns the moves of the side to move that are worth searching at the root.
+
+        Every capture is a move of its own, so the search decides which checker to remove.
+        Moves the position's symmetries map onto each other are equally good, one of them is searched.
+        """
+        return unique_moves(
+            generate_moves(state),
+            stabilizer(state.board.pieces[1], state.board.pieces[2]),
+        )
+
+    def choose_move(self, state: GameState):
+        """
+        Chooses the move of the side to move, including the checker to remove when the move forms a mill.
+
+        Returns:
+        The encoded move, or None if the side to move cannot move.
+        """
+        # Play known openings and exact endgames without searching
+        if self.opening_book is not None:
+            move = self.opening_book.lookup(state, self.min_book_depth)
+            if move is not None:
+                if self.collect_stats:
+                    self.stats = SearchStats("book")
+                return move
+        if self.tablebase is not None:
+            move = self.tablebase.best_move(state)
+            if move is not None:
+                if self.collect_stats:
+                    self.stats = SearchStats("tablebase")
+                return move
+
+        root_moves = self.root_moves(state)
+        if not root_moves:
+            return None
+
+        _, best_moves, _ = self.iterative_deepening(state, root_moves)
+
+        if state.phase() == Phase.PLACEMENT:
+            # Randomly choose from equally valued moves
+            best_move = self.random.choice(best_moves)
+        else:
+            best_move = best_moves[0]
+
+        return best_move
+
+
+# Search instance of a worker process, kept between tasks so that its transposition table is reused
+_worker_search = None
+
+
+def init_search_worker(table_size_bits: int, canonical_positions: bool):
+    """
+    Initializer of the worker processes of a parallel search, creates the worker's search instance.
+
+    Args:
+    - table_size_bits: The transposition table of the worker gets 2 ** table_size_bits slots.
+    - canonical_positions: Whether the worker keys positions by their symmetry-canonical hash
+      (see MinimaxSearch).
+    """
+    global _worker_search
+    _worker_search = MinimaxSearch(
+        transposition_table=TranspositionTable(table_size_bits),
+        canonical_positions=canonical_positions,
+    )
+
+
+def search_root_worker(
+    state: GameState,
+    root_moves: list[int],
+    depth: int,
+    time_budget_ms: float,
+    evaluator=None,
+):
+    """
+    Searches a share of the root moves inside a worker process, on the worker's own copy of the state.
+
+    Args:
+    - state: The position to search.
+    - root_moves: The root moves assigned to this worker.
+    - depth: The depth to search the moves to.
+    - time_budget_ms: Time left for the search, in milliseconds.
+    - evaluator: The evaluator of the searching process (see MinimaxSearch).
+
+    Returns:
+    The best score, the best moves and the (nodes, cutoffs) counts of the share,
+    or None if the time ran out.
+    """
+    global _worker_search
+    if _worker_search is None:
+        # The pool was started without init_search_worker
+        _worker_search = MinimaxSearch()
+
+    search = _worker_search
+    if evaluator != search.evaluator:
+        # Scores of another evaluation must not be reused
+        search.evaluator = evaluator
+        search.transposition_table.clear()
+    search.transposition_table.new_search()
+    search.deadline = perf_counter() + time_budget_ms / 1000
+    search.nodes_until_time_check = TIME_CHECK_INTERVAL
+    nodes, cutoffs = search.nodes, search.cutoffs
+    try:
+        best_value, best_moves = search.search_root(state, root_moves, depth)
+        return best_value, best_moves, (search.nodes - nodes, search.cutoffs - cutoffs)
+    except SearchTimeout:
+        return None
+    finally:
+        search.deadline = None
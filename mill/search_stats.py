@@ -0,0 +1,148 @@
+"""
+Statistics of the Nine Men's Morris AI's search.
+
+A MinimaxSearch created with collect_stats=True (see ``search.py``) fills a SearchStats
+for every move it chooses: where the move came from (opening book, tablebase or search)
+and, for every iteration of the iterative deepening, the searched positions per ply,
+cutoffs, transposition table hits, time, score and principal variation.
+The statistics are plain objects that turn into JSON-ready dictionaries with to_dict,
+and are traced to the "mill.search" logger.
+
+Without collect_stats the search only keeps its running counters, so the statistics
+cost nothing in normal play.
+"""
+
+import logging
+
+from bitboard import format_move
+
+
+logger = logging.getLogger("mill.search")
+
+
+class IterationStats:
+    """
+    Statistics of one iteration (one depth) of the iterative deepening.
+
+    Attributes:
+    - depth: The depth searched.
+    - completed: False if the time budget ran out during the iteration.
+    - seconds: Wall-clock time of the iteration.
+    - nodes: Positions searched, including those of worker processes.
+    - ply_nodes: Positions searched at every ply from the root (this process only).
+    - cutoffs: Beta cutoffs.
+    - table_probes, table_hits: Transposition table lookups and how many found their position
+      (this process only).
+    - value: The best score found (completed iterations only).
+    - best_moves: The equally good best moves (completed iterations only).
+    - principal_variation: The expected line of play, starting with the first best move.
+    """
+
+    def __init__(self, depth: int):
+        self.depth = depth
+        self.completed = False
+        self.seconds = 0.0
+        self.nodes = 0
+        self.ply_nodes = []
+        self.cutoffs = 0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.value = None
+        self.best_moves = []
+        self.principal_variation = []
+
+    def branching_factors(self):
+        """
+        Returns the average number of searched children of a position at every ply.
+        """
+        return [
+            round(children / parents, 2)
+            for parents, children in zip(self.ply_nodes, self.ply_nodes[1:])
+            if parents
+        ]
+
+    def to_dict(self):
+        return {
+            "depth": self.depth,
+            "completed": self.completed,
+            "seconds": round(self.seconds, 6),
+            "nodes": self.nodes,
+            "nodes_per_second": (
+                round(self.nodes / self.seconds) if self.seconds else None
+            ),
+            "ply_nodes": self.ply_nodes,
+            "branching_factors": self.branching_factors(),
+            "cutoffs": self.cutoffs,
+            "table_probes": self.table_probes,
+            "table_hits": self.table_hits,
+            "value": self.value,
+            "best_moves": [format_move(move) for move in self.best_moves],
+            "principal_variation": [
+                format_move(move) for move in self.principal_variation
+            ],
+        }
+
+    def __str__(self):
+        status = "" if self.completed else " (timed out)"
+        line = " ".join(format_move(move) for move in self.principal_variation)
+        return (
+            f"depth {self.depth}{status}: "
+            f"{self.nodes} nodes in {self.seconds * 1000:.1f} ms, "
+            f"{self.cutoffs} cutoffs, {self.table_hits}/{self.table_probes} table hits, "
+            f"value {self.value}, pv {line or '-'}"
+        )
+
+
+class SearchStats:
+    """
+    Statistics of choosing one move.
+
+    Attributes:
+    - source: "book", "tablebase" or "search", depending on where the move came from.
+    - root_moves: Number of root moves searched.
+    - seconds: Wall-clock time of the whole search.
+    - iterations: IterationStats of every iteration, the last one may be unfinished.
+    """
+
+    def __init__(self, source: str = "search", root_moves: int = 0):
+        self.source = source
+        self.root_moves = root_moves
+        self.seconds = 0.0
+        self.iterations = []
+
+    @property
+    def completed_depth(self):
+        return max(
+            (iteration.depth for iteration in self.iterations if iteration.completed),
+            default=0,
+        )
+
+    @property
+    def nodes(self):
+        return sum(iteration.nodes for iteration in self.iterations)
+
+    @property
+    def principal_variation(self):
+        for iteration in reversed(self.iterations):
+            if iteration.completed:
+                return iteration.principal_variation
+        return []
+
+    def to_dict(self):
+        return {
+            "source": self.source,
+            "root_moves": self.root_moves,
+            "seconds": round(self.seconds, 6),
+            "completed_depth": self.completed_depth,
+            "nodes": self.nodes,
+            "iterations": [iteration.to_dict() for iteration in self.iterations],
+        }
+
+    def __str__(self):
+        if self.source != "search":
+            return f"move from the {self.source}"
+        line = " ".join(format_move(move) for move in self.principal_variation)
+        return (
+            f"{self.root_moves} root moves searched to depth {self.completed_depth}: "
+            f"{self.nodes} nodes in {self.seconds * 1000:.1f} ms, pv {line or '-'}"
+        )
@@ -0,0 +1,275 @@
+"""
+Headless self-play for the Nine Men's Morris AI.
+
+Plays batches of AI-vs-AI or AI-vs-random games in worker processes, without any
+terminal interface, and streams one JSON line per finished game to a file.
+Every record holds the moves, the winner, the number of plies and the search time
+and searched positions of every AI move. A summary with games per second and
+searched positions per second is printed at the end.
+
+Both players' engines can be chosen: "ai" is the minimax search, "mcts" the Monte Carlo
+tree search (see ``mcts.py``) and "random" a random mover (opponent only).
+With --evaluation, Player 2's AI evaluates positions with a learned model
+(see ``learned_evaluation.py``), so it can be measured against the hand-tuned AI.
+
+Usage:
+    python self_play.py --games 100 --workers 4 --opponent random --output games.jsonl
+"""
+
+import argparse
+import json
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from time import perf_counter
+
+from bitboard import format_move
+from game_state import GameState, generate_moves
+from learned_evaluation import LearnedEvaluator
+from mcts import MonteCarloTreeSearch
+from search import MinimaxSearch
+
+
+# Games reaching this many plies are stopped and recorded as a draw.
+MAX_PLIES = 200
+
+
+class RandomPlayer:
+    """
+    Player choosing uniformly between all legal moves, used as a baseline opponent.
+    """
+
+    def __init__(self, seed: int = None):
+        self.random = random.Random(seed)
+        self.nodes = 0
+
+    def choose_move(self, state: GameState):
+        """
+        Chooses a random legal move of the side to move, mill-forming moves come with a random capture.
+
+        Returns:
+        The encoded move, or None if the side to move cannot move.
+        """
+        moves = generate_moves(state)
+        if not moves:
+            return None
+        return self.random.choice(moves)
+
+
+def create_player(
+    kind: str, seed: int, time_budget_ms: int, max_depth: int, evaluation_path: str = None
+):
+    """
+    Creates a player of the given kind ("ai", "mcts" or "random"),
+    an AI evaluating with the learned model in the weights file if one is given.
+    """
+    if kind == "random":
+        return RandomPlayer(seed)
+
+    evaluator = None
+    if evaluation_path is not None:
+        evaluator = LearnedEvaluator.load(evaluation_path)
+    if kind == "mcts":
+        return MonteCarloTreeSearch(time_budget_ms, seed=seed, evaluator=evaluator)
+    return MinimaxSearch(time_budget_ms, max_depth, seed=seed, evaluator=evaluator)
+
+
+def play_game(
+    game_id: int,
+    seed: int,
+    opponent: str = "ai",
+    time_budget_ms: int = 100,
+    max_depth: int = 24,
+    max_plies: int = MAX_PLIES,
+    evaluation_path: str = None,
+    engine: str = "ai",
+):
+    """
+    Plays a single game between the AI (Player 2) and the opponent (Player 1).
+
+    Args:
+    - game_id: Number of the game, copied to the record.
+    - seed: Seed of the game, both players' random generators are derived from it.
+    - opponent: "ai", "mcts" or "random".
+    - time_budget_ms: Time budget of every AI move, in milliseconds.
+    - max_depth: The deepest search the AI tries.
+    - max_plies: Number of plies after which the game is recorded as a draw.
+    - evaluation_path: Weights file of the learned evaluation of Player 2's AI, None for the hand-tuned one.
+    - engine: Player 2's engine, "ai" or "mcts".
+
+    Returns:
+    The game record as a dictionary. The winner is None for a draw.
+    """
+    seeds = random.Random(seed)
+    players = (
+        None,
+        create_player(opponent, seeds.getrandbits(32), time_budget_ms, max_depth),
+        create_player(
+            engine, seeds.getrandbits(32), time_budget_ms, max_depth, evaluation_path
+        ),
+    )
+
+    state = GameState()
+    moves = []
+    move_times_ms = []
+    nodes = []
+    passes = 0
+
+    while not state.is_over() and len(moves) < max_plies:
+        player = players[state.side_to_move]
+        nodes_before = player.nodes
+        start = perf_counter()
+        move = player.choose_move(state)
+        move_times_ms.append(round((perf_counter() - start) * 1000, 3))
+        nodes.append(player.nodes - nodes_before)
+
+        if move is None:
+            # The side to move is blocked, the turn passes to the opponent
+            passes += 1
+            if passes == 2:
+                break
+            moves.append(None)
+            state.side_to_move = 3 - state.side_to_move
+            continue
+
+        passes = 0
+        moves.append(format_move(move))
+        state.make_move(move)
+
+    return {
+        "game": game_id,
+        "seed": seed,
+        "opponent": opponent,
+        "engine": engine,
+        "winner": state.winner(),
+        "plies": len(moves),
+        "moves": moves,
+        "move_times_ms": move_times_ms,
+        "nodes": nodes,
+    }
+
+
+def run_self_play(
+    games: int,
+    output,
+    workers: int = 1,
+    opponent: str = "ai",
+    time_budget_ms: int = 100,
+    max_depth: int = 24,
+    seed: int = 0,
+    evaluation_path: str = None,
+    engine: str = "ai",
+):
+    """
+    Plays the games in a process pool and writes every record to the output as soon as its game ends.
+
+    Args:
+    - games: Number of games to play.
+    - output: Text file the JSON lines are written to.
+    - workers: Number of worker processes.
+    - opponent: "ai", "mcts" or "random".
+    - time_budget_ms: Time budget of every AI move, in milliseconds.
+    - max_depth: The deepest search the AI tries.
+    - seed: Seed the per-game seeds are derived from, the same seed replays the same games
+      as long as the searches complete the same depths.
+    - evaluation_path: Weights file of the learned evaluation of Player 2's AI, None for the hand-tuned one.
+    - engine: Player 2's engine, "ai" or "mcts".
+
+    Returns:
+    A summary with the number of games, the wins per player, the elapsed time,
+    games per second and searched positions per second.
+    """
+    seeds = random.Random(seed)
+    game_seeds = [seeds.getrandbits(32) for _ in range(games)]
+    wins = {"1": 0, "2": 0, "draw": 0}
+    total_nodes = 0
+
+    start = perf_counter()
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [
+            executor.submit(
+                play_game,
+                game_id,
+                game_seed,
+                opponent,
+                time_budget_ms,
+                max_depth,
+                evaluation_path=evaluation_path,
+                engine=engine,
+            )
+            for game_id, game_seed in enumerate(game_seeds)
+        ]
+        for future in as_completed(futures):
+            record = future.result()
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+
+            winner = record["winner"]
+            wins[str(winner) if winner is not None else "draw"] += 1
+            total_nodes += sum(record["nodes"])
+    elapsed = perf_counter() - start
+
+    return {
+        "games": games,
+        "wins": wins,
+        "seconds": round(elapsed, 3),
+        "games_per_second": round(games / elapsed, 3),
+        "nodes": total_nodes,
+        "nodes_per_second": round(total_nodes / elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless self-play for the mill AI.")
+    parser.add_argument("--games", type=int, default=10, help="Number of games to play.")
+    parser.add_argument("--workers", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument(
+        "--opponent",
+        choices=("ai", "mcts", "random"),
+        default="ai",
+        help="Player 1's kind.",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("ai", "mcts"),
+        default="ai",
+        help="Player 2's engine, the minimax search or the Monte Carlo tree search.",
+    )
+    parser.add_argument(
+        "--time-budget-ms", type=int, default=100, help="Time budget of every AI move."
+    )
+    parser.add_argument(
+        "--max-depth", type=int, default=24, help="The deepest search the AI tries."
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the whole batch.")
+    parser.add_argument(
+        "--evaluation",
+        help="Weights file of a learned evaluation for Player 2's AI (see learned_evaluation.py).",
+    )
+    parser.add_argument(
+        "--output", default="-", help="JSON lines file to write, '-' for standard output."
+    )
+    args = parser.parse_args()
+
+    output = sys.stdout if args.output == "-" else open(args.output, "w")
+    try:
+        summary = run_self_play(
+            args.games,
+            output,
+            args.workers,
+            args.opponent,
+            args.time_budget_ms,
+            args.max_depth,
+            args.seed,
+            args.evaluation,
+            args.engine,
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    print(json.dumps(summary), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
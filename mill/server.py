@@ -0,0 +1,296 @@
+"""
+Nine Men's Morris game server.
+
+Hosts any number of games against the AI over a local TCP connection. Every connection
+is one session with its own GameState; the client plays Player 1 and the AI Player 2.
+The AI searches in a process pool, so the event loop keeps serving the other sessions
+while a move is being computed.
+
+Every message is a single line of JSON. Requests of the client:
+- {"type": "new_game"}: Starts a new game (a game is also started on connecting).
+- {"type": "move", "move": "4-5x7"}: Plays a move written as "5" (placement), "4-5" (move)
+  with an optional "x7" (removed checker), using positions 1-24.
+- {"type": "stats"}: Asks for the latency statistics of the session.
+
+The server answers every request with a "state" message (the board, the legal moves,
+the AI's replies, the winner and whether the game is drawn), a "stats" message or an "error"
+message. Requests longer than the stream limit are answered with an "error" message and dropped.
+
+A blocked player (no legal move while the game is not over) passes, like in self_play.py:
+when the client is blocked after the AI's reply, the AI moves again, and the moves are all
+listed in "ai_moves". The game is drawn when both players are blocked, or when the client
+has passed MAX_PASSES times in a row.
+Latencies are measured from receiving a request to sending its answer.
+AI moves taking more than SLOW_MOVE_FACTOR times the time budget are logged as warnings
+together with their search statistics (see ``search_stats.py``).
+
+Usage:
+    python server.py --port 8765 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from bitboard import POINT_COUNT, format_move, parse_move
+from game_state import GameState, generate_moves
+from search import DEFAULT_TIME_BUDGET_MS, MinimaxSearch
+
+
+logger = logging.getLogger("mill.server")
+
+# AI moves slower than this multiple of the time budget are logged with their search statistics
+SLOW_MOVE_FACTOR = 1.5
+
+# Number of passes in a row of a blocked client after which the game is drawn
+MAX_PASSES = 50
+
+# Search instance of a worker process, shared by all sessions the worker computes moves for
+_worker_search = None
+
+
+def compute_ai_move(state: GameState, time_budget_ms: int):
+    """
+    Chooses the AI's move inside a worker process.
+
+    Returns:
+    The encoded move (None if the AI cannot move) and the statistics of choosing it.
+    """
+    global _worker_search
+    if _worker_search is None:
+        _worker_search = MinimaxSearch(time_budget_ms, collect_stats=True)
+
+    _worker_search.time_budget_ms = time_budget_ms
+    move = _worker_search.choose_move(state)
+    stats = _worker_search.stats
+    return move, stats.to_dict() if stats is not None else None
+
+
+def describe_state(state: GameState, drawn: bool = False):
+    """
+    Returns the JSON-ready description of the game sent to the client.
+    """
+    return {
+        "type": "state",
+        "board": [state.board.state(point) for point in range(POINT_COUNT)],
+        "side_to_move": state.side_to_move,
+        "phase": state.phase().name.lower(),
+        "in_hand": state.in_hand[1:],
+        "checkers": state.checkers[1:],
+        "legal_moves": [format_move(move) for move in generate_moves(state)],
+        "winner": state.winner(),
+        "draw": drawn,
+    }
+
+
+class Session:
+    """
+    A single client connection and its game.
+
+    Attributes:
+    - state: The current game.
+    - drawn: Whether the current game ended in a draw because the players were blocked.
+    - latencies_ms: Time taken to answer every request, in milliseconds.
+    """
+
+    def __init__(self, server: "GameServer", reader, writer):
+        self.server = server
+        self.reader = reader
+        self.writer = writer
+        self.state = GameState()
+        self.drawn = False
+        self.latencies_ms = []
+
+    async def send(self, message: dict):
+        self.writer.write(json.dumps(message).encode() + b"\n")
+        await self.writer.drain()
+
+    async def run(self):
+        """
+        Serves the requests of the client until it disconnects.
+        """
+        await self.send(describe_state(self.state))
+
+        while True:
+            try:
+                line = await self.reader.readline()
+            except ValueError as error:
+                # The line is longer than the stream limit, the reader has dropped it
+                logger.warning("Dropped an over-long request: %s", error)
+                await self.send({"type": "error", "message": "The request is too long"})
+                continue
+            if not line:
+                break
+
+            start = perf_counter()
+            try:
+                request = json.loads(line)
+                response = await self.handle(request)
+            except (ValueError, KeyError, TypeError) as error:
+                response = {"type": "error", "message": str(error)}
+            latency_ms = (perf_counter() - start) * 1000
+            self.latencies_ms.append(latency_ms)
+            response["latency_ms"] = round(latency_ms, 3)
+            await self.send(response)
+
+    async def handle(self, request: dict):
+        """
+        Handles one request and returns the answer.
+        """
+        kind = request["type"]
+
+        if kind == "new_game":
+            self.state = GameState()
+            self.drawn = False
+            return describe_state(self.state)
+
+        if kind == "stats":
+            return {"type": "stats", **latency_summary(self.latencies_ms)}
+
+        if kind != "move":
+            raise ValueError(f"Unknown request type {kind!r}")
+
+        if self.state.is_over() or self.drawn:
+            raise ValueError("The game is over, start a new one")
+        if self.state.side_to_move != 1:
+            raise ValueError("It is not your turn")
+
+        move = parse_move(request["move"])
+        if move not in generate_moves(self.state):
+            raise ValueError(f"Illegal move {request['move']!r}")
+        self.state.make_move(move)
+
+        # The AI replies, and moves again as long as Player 1 is blocked and has to pass
+        ai_moves = []
+        passes = 0
+        while not self.state.is_over():
+            ai_move = await self.server.ai_move(self.state)
+            ai_moves.append(ai_move)
+            if ai_move is None:
+                # The AI cannot move, the turn passes back to Player 1
+                self.state.side_to_move = 1
+            else:
+                self.state.make_move(ai_move)
+
+            if self.state.is_over() or generate_moves(self.state):
+                break
+            passes += 1
+            if ai_move is None or passes == MAX_PASSES:
+                # Both players are blocked, or Player 1 stays blocked
+                self.drawn = True
+                break
+            self.state.side_to_move = 2
+
+        response = describe_state(self.state, self.drawn)
+        response["ai_moves"] = [
+            format_move(ai_move) if ai_move is not None else None for ai_move in ai_moves
+        ]
+        response["ai_move"] = response["ai_moves"][-1] if ai_moves else None
+        return response
+
+
+def latency_summary(latencies_ms: list[float]):
+    """
+    Returns the number of requests and the mean, median, 99th percentile and maximum latency in milliseconds.
+    """
+    if not latencies_ms:
+        return {"requests": 0}
+
+    ordered = sorted(latencies_ms)
+    return {
+        "requests": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered), 3),
+        "p50_ms": round(ordered[len(ordered) // 2], 3),
+        "p99_ms": round(ordered[min(len(ordered) - 1, len(ordered) * 99 // 100)], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+class GameServer:
+    """
+    TCP server hosting the sessions.
+
+    Attributes:
+    - executor: Process pool the AI moves are computed in.
+    - time_budget_ms: Time budget of every AI move, in milliseconds.
+    - sessions: Number of currently connected sessions.
+    """
+
+    def __init__(self, executor: ProcessPoolExecutor, time_budget_ms: int):
+        self.executor = executor
+        self.time_budget_ms = time_budget_ms
+        self.sessions = 0
+
+    async def ai_move(self, state: GameState):
+        """
+        Computes the AI's move in the process pool without blocking the event loop.
+        Logs the search statistics of moves that took much longer than the time budget.
+        """
+        loop = asyncio.get_running_loop()
+        start = perf_counter()
+        move, stats = await loop.run_in_executor(
+            self.executor, compute_ai_move, state, self.time_budget_ms
+        )
+        elapsed_ms = (perf_counter() - start) * 1000
+        if elapsed_ms > self.time_budget_ms * SLOW_MOVE_FACTOR:
+            logger.warning("Slow AI move (%.0f ms): %s", elapsed_ms, json.dumps(stats))
+        return move
+
+    async def handle_connection(self, reader, writer):
+        session = Session(self, reader, writer)
+        self.sessions += 1
+        peer = writer.get_extra_info("peername")
+        logger.info("Session %s connected (%d open)", peer, self.sessions)
+        try:
+            await session.run()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            logger.info(
+                "Session %s closed (%d open): %s",
+                peer,
+                self.sessions,
+                latency_summary(session.latencies_ms),
+            )
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        logger.info("Serving on %s:%d", host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nine Men's Morris game server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="AI worker processes (default: CPU count).",
+    )
+    parser.add_argument(
+        "--time-budget-ms",
+        type=int,
+        default=DEFAULT_TIME_BUDGET_MS,
+        help="Time budget of every AI move.",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    with ProcessPoolExecutor(args.workers) as executor:
+        server = GameServer(executor, args.time_budget_ms)
+        try:
+            asyncio.run(server.serve(args.host, args.port))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
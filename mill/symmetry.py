@@ -0,0 +1,259 @@
+"""
+Symmetries of the Nine Men's Morris board.
+
+The board has 16 symmetries: the 8 rotations and reflections of the square combined
+with swapping the inner and the outer ring. Each of them maps mill lines to mill lines
+and neighbours to neighbours, so symmetric positions have the same value and their
+best moves map onto each other.
+
+Every point is described by its ring (0 outer, 1 middle, 2 inner) and its place on the
+ring (0-7, clockwise from the top left corner). The symmetries are precomputed as
+permutations of the 24 points and as byte lookup tables that map a whole bitboard
+with three table reads.
+
+The canonical form of a position is its smallest image. Opening books and tables key
+positions by it, and the search can key its transposition table by the smallest Zobrist
+hash of all images, so symmetric positions share one entry.
+"""
+
+from bitboard import (
+    MOVE_FROM_SHIFT,
+    MOVE_POINT_MASK,
+    MOVE_REMOVED_SHIFT,
+    PIECE_KEYS,
+    POINT_COUNT,
+    Board,
+    encode_move,
+)
+
+
+# RING_POINTS[ring][place] is the 0-based point at that place of the ring.
+RING_POINTS = (
+    tuple(position - 1 for position in (1, 2, 3, 15, 24, 23, 22, 10)),
+    tuple(position - 1 for position in (4, 5, 6, 14, 21, 20, 19, 11)),
+    tuple(position - 1 for position in (7, 8, 9, 13, 18, 17, 16, 12)),
+)
+
+SYMMETRY_COUNT = 16
+
+
+def _build_permutations():
+    """
+    Builds the 16 symmetries as tuples mapping every point to its image.
+    Symmetry number s rotates by (s & 3) quarter turns, mirrors when bit 2 is set
+    and swaps the inner and the outer ring when bit 3 is set.
+    """
+    permutations = []
+
+    for symmetry in range(SYMMETRY_COUNT):
+        permutation = [0] * POINT_COUNT
+        for ring in range(3):
+            for place in range(8):
+                new_place = place
+                if symmetry & 4:
+                    new_place = (2 - new_place) % 8
+                new_place = (new_place + 2 * (symmetry & 3)) % 8
+                new_ring = 2 - ring if symmetry & 8 else ring
+                image = RING_POINTS[new_ring][new_place]
+                permutation[RING_POINTS[ring][place]] = image
+        permutations.append(tuple(permutation))
+
+    return tuple(permutations)
+
+
+PERMUTATIONS = _build_permutations()
+
+# INVERSES[s] is the symmetry undoing symmetry s.
+INVERSES = tuple(
+    next(
+        other
+        for other in range(SYMMETRY_COUNT)
+        if all(
+            PERMUTATIONS[other][image] == point
+            for point, image in enumerate(permutation)
+        )
+    )
+    for permutation in PERMUTATIONS
+)
+
+
+def _build_byte_tables():
+    """
+    Builds, for every symmetry, three tables mapping the value of one byte
+    of a bitboard to the image of its bits.
+    """
+    tables = []
+
+    for permutation in PERMUTATIONS:
+        symmetry_tables = []
+        for shift in (0, 8, 16):
+            table = []
+            for value in range(256):
+                mask = 0
+                for bit in range(8):
+                    if value >> bit & 1:
+                        mask |= 1 << permutation[shift + bit]
+                table.append(mask)
+            symmetry_tables.append(tuple(table))
+        tables.append(tuple(symmetry_tables))
+
+    return tuple(tables)
+
+
+BYTE_TABLES = _build_byte_tables()
+
+
+def _build_zobrist_tables():
+    """
+    Builds, for every symmetry, six tables (three bytes of each player's bitboard) mapping
+    the value of a byte to the XOR of the Zobrist keys of the images of its checkers.
+    """
+    tables = []
+
+    for permutation in PERMUTATIONS:
+        symmetry_tables = []
+        for player in (1, 2):
+            keys = PIECE_KEYS[player]
+            for shift in (0, 8, 16):
+                table = []
+                for value in range(256):
+                    key = 0
+                    for bit in range(8):
+                        if value >> bit & 1:
+                            key ^= keys[permutation[shift + bit]]
+                    table.append(key)
+                symmetry_tables.append(tuple(table))
+        tables.append(tuple(symmetry_tables))
+
+    return tuple(tables)
+
+
+ZOBRIST_TABLES = _build_zobrist_tables()
+
+
+def transform(pieces: int, symmetry: int):
+    """
+    Returns the image of the bitboard under the symmetry.
+    """
+    low, middle, high = BYTE_TABLES[symmetry]
+    return low[pieces & 0xFF] | middle[(pieces >> 8) & 0xFF] | high[pieces >> 16]
+
+
+def transform_move(move: int, symmetry: int):
+    """
+    Returns the image of the encoded move under the symmetry.
+    """
+    permutation = PERMUTATIONS[symmetry]
+    from_point = ((move >> MOVE_FROM_SHIFT) & MOVE_POINT_MASK) - 1
+    removed_point = (move >> MOVE_REMOVED_SHIFT) - 1
+
+    return encode_move(
+        permutation[move & MOVE_POINT_MASK],
+        permutation[from_point] if from_point >= 0 else -1,
+        permutation[removed_point] if removed_point >= 0 else -1,
+    )
+
+
+def canonical(mover_pieces: int, opponent_pieces: int):
+    """
+    Maps the position to its representative: the image with the smallest combined
+    bitboard (mover_pieces | opponent_pieces << 24) among all 16 symmetries.
+
+    Returns:
+    The combined bitboard of the representative and the symmetry leading to it.
+    """
+    best = None
+    best_symmetry = 0
+
+    for symmetry in range(SYMMETRY_COUNT):
+        low, middle, high = BYTE_TABLES[symmetry]
+        image = (
+            low[mover_pieces & 0xFF]
+            | middle[(mover_pieces >> 8) & 0xFF]
+            | high[mover_pieces >> 16]
+            | (
+                low[opponent_pieces & 0xFF]
+                | middle[(opponent_pieces >> 8) & 0xFF]
+                | high[opponent_pieces >> 16]
+            )
+            << POINT_COUNT
+        )
+        if best is None or image < best:
+            best = image
+            best_symmetry = symmetry
+
+    return best, best_symmetry
+
+
+def canonical_hash(board: Board):
+    """
+    Returns the smallest Zobrist hash among the 16 images of the board's checkers
+    and the symmetry leading to it. Symmetry 0 is the identity, so its hash equals board.hash.
+    """
+    player_1_pieces, player_2_pieces = board.pieces[1], board.pieces[2]
+    low_byte_1, middle_byte_1, high_byte_1 = (
+        player_1_pieces & 0xFF,
+        (player_1_pieces >> 8) & 0xFF,
+        player_1_pieces >> 16,
+    )
+    low_byte_2, middle_byte_2, high_byte_2 = (
+        player_2_pieces & 0xFF,
+        (player_2_pieces >> 8) & 0xFF,
+        player_2_pieces >> 16,
+    )
+    best = None
+    best_symmetry = 0
+
+    for symmetry, (low_1, middle_1, high_1, low_2, middle_2, high_2) in enumerate(
+        ZOBRIST_TABLES
+    ):
+        key = (
+            low_1[low_byte_1]
+            ^ middle_1[middle_byte_1]
+            ^ high_1[high_byte_1]
+            ^ low_2[low_byte_2]
+            ^ middle_2[middle_byte_2]
+            ^ high_2[high_byte_2]
+        )
+        if best is None or key < best:
+            best = key
+            best_symmetry = symmetry
+
+    return best, best_symmetry
+
+
+def stabilizer(player_1_pieces: int, player_2_pieces: int):
+    """
+    Returns the symmetries other than the identity that map the position onto itself.
+    """
+    return [
+        symmetry
+        for symmetry in range(1, SYMMETRY_COUNT)
+        if transform(player_1_pieces, symmetry) == player_1_pieces
+        and transform(player_2_pieces, symmetry) == player_2_pieces
+    ]
+
+
+def unique_moves(moves: list[int], symmetries: list[int]):
+    """
+    Keeps one move of every group of moves the symmetries of the position map onto each other.
+    Such moves lead to symmetric positions of the same value, so only one of them needs searching.
+
+    Args:
+    - moves: Encoded moves made in a position.
+    - symmetries: The position's symmetries (see stabilizer).
+    """
+    if not symmetries:
+        return moves
+
+    kept = set()
+    unique = []
+    for move in moves:
+        if move in kept or any(
+            transform_move(move, symmetry) in kept for symmetry in symmetries
+        ):
+            continue
+        kept.add(move)
+        unique.append(move)
+
+    return unique
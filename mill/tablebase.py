@@ -0,0 +1,425 @@
+"""
+Endgame tablebases for Nine Men's Morris.
+
+A table holds the exact result of every position of the movement phase with a given
+number of checkers on both sides, found offline by retrograde analysis. Tables are
+stored from the point of view of the side to move: the table "4v3" holds all positions
+where the side to move has 4 checkers and the other side 3. Because both players follow
+the same rules, one table serves both of them.
+
+Every position takes one byte, its distance to the end of the game in plies:
+- 0: the game is drawn with best play (neither side can force a win),
+- odd: the side to move wins in that many plies,
+- even: the side to move loses in that many plies.
+
+Positions are indexed compactly with the combinatorial number system: the rank of the
+mover's checkers among all 24 points, combined with the rank of the other side's checkers
+among the remaining points. The files are memory-mapped when probed, so a process only
+loads the pages it touches.
+
+The rules follow the game in ``main.py``: forming a mill removes any of the opponent's
+checkers, a player left with 2 checkers loses, a player with 3 checkers may fly and
+a blocked player passes the turn.
+
+Usage:
+    python tablebase.py 3v3 4v3 --directory tablebases
+"""
+
+import argparse
+import mmap
+import os
+from enum import Enum
+from math import comb
+
+from bitboard import (
+    ADJACENT_MASKS,
+    FULL_BOARD,
+    POINT_COUNT,
+    completes_mill,
+    iter_points,
+)
+from game_state import (
+    FLYING_CHECKER_COUNT,
+    LOSING_CHECKER_COUNT,
+    GameState,
+    generate_moves,
+)
+
+
+TABLEBASE_DIRECTORY = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "tablebases"
+)
+MAX_DISTANCE = 255
+
+# COMBINATIONS[n][k] is the number of ways to choose k of n points.
+COMBINATIONS = tuple(
+    tuple(comb(n, k) for k in range(10)) for n in range(POINT_COUNT + 1)
+)
+
+
+class Outcome(Enum):
+    WIN = 0
+    LOSS = 1
+    DRAW = 2
+
+
+def table_name(mover_count: int, opponent_count: int):
+    """
+    Returns the file name of the table for the given numbers of checkers.
+    """
+    return f"mill_{mover_count}v{opponent_count}.tb"
+
+
+def table_size(mover_count: int, opponent_count: int):
+    """
+    Returns the number of positions in the table for the given numbers of checkers.
+    """
+    return comb(POINT_COUNT, mover_count) * comb(
+        POINT_COUNT - mover_count, opponent_count
+    )
+
+
+def _rank(pieces: int, taken: int):
+    """
+    Returns the combinatorial rank of the checkers among the points not taken by the other bitboard.
+    """
+    rank = 0
+    for i, point in enumerate(iter_points(pieces), 1):
+        rank += COMBINATIONS[point - (taken & ((1 << point) - 1)).bit_count()][i]
+    return rank
+
+
+def position_index(mover_pieces: int, opponent_pieces: int):
+    """
+    Returns the index of the position (side to move first) in its table.
+    """
+    opponent_count = opponent_pieces.bit_count()
+    free_points = POINT_COUNT - mover_pieces.bit_count()
+    return _rank(mover_pieces, 0) * COMBINATIONS[free_points][opponent_count] + _rank(
+        opponent_pieces, mover_pieces
+    )
+
+
+def outcome_of(distance: int):
+    """
+    Returns the Outcome a stored distance stands for.
+    """
+    if distance == 0:
+        return Outcome.DRAW
+    return Outcome.WIN if distance & 1 else Outcome.LOSS
+
+
+def _iter_positions(mover_count: int, opponent_count: int):
+    """
+    Yields every (mover_pieces, opponent_pieces) pair with the given numbers of checkers.
+    """
+    for mover_pieces in _iter_subsets(FULL_BOARD, mover_count):
+        for opponent_pieces in _iter_subsets(FULL_BOARD ^ mover_pieces, opponent_count):
+            yield mover_pieces, opponent_pieces
+
+
+def _iter_subsets(mask: int, count: int):
+    """
+    Yields every bitboard made of 'count' of the points set in the mask.
+    """
+    if count == 0:
+        yield 0
+        return
+
+    for point in iter_points(mask):
+        bit = 1 << point
+        # Only take higher points next, so every subset is produced once
+        for rest in _iter_subsets(mask & ~((bit << 1) - 1), count - 1):
+            yield bit | rest
+
+
+def _iter_destinations(pieces: int, empty: int, flying: bool):
+    """
+    Yields (from_point, to_point) for every move of the checkers to empty points.
+    """
+    for from_point in iter_points(pieces):
+        targets = empty if flying else ADJACENT_MASKS[from_point] & empty
+        for to_point in iter_points(targets):
+            yield from_point, to_point
+
+
+class _Table:
+    """
+    A table under construction together with the bookkeeping of the retrograde analysis.
+
+    Attributes:
+    - values: The distance of every position, 0 while it is unresolved.
+    - counts: Number of unresolved successors inside the tables being built.
+    - escapes: Set for positions with a successor outside the tables that does not lose for the mover.
+    - longest_losses: The longest win of the opponent among the resolved successors.
+    """
+
+    def __init__(self, mover_count: int, opponent_count: int):
+        self.mover_count = mover_count
+        self.opponent_count = opponent_count
+        size = table_size(mover_count, opponent_count)
+        self.values = bytearray(size)
+        self.counts = bytearray(size)
+        self.escapes = bytearray(size)
+        self.longest_losses = bytearray(size)
+
+
+def build_tables(
+    mover_count: int, opponent_count: int, directory: str = TABLEBASE_DIRECTORY
+):
+    """
+    Builds the tables "AvB" and "BvA" for the given numbers of checkers and writes them to the directory.
+
+    A move of the A side that forms a mill leads into the "B-1vA" table, which must have been built
+    before (unless B-1 is the losing checker count). Build smaller tables first, e.g. 3v3, then 4v3, then 4v4.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tablebase = Tablebase(directory)
+    tables = {(mover_count, opponent_count): _Table(mover_count, opponent_count)}
+    tables.setdefault(
+        (opponent_count, mover_count), _Table(opponent_count, mover_count)
+    )
+
+    # Positions to resolve, by distance: (table key, mover_pieces, opponent_pieces, is_win)
+    buckets = {}
+
+    def push(distance, key, mover_pieces, opponent_pieces, is_win):
+        if distance > MAX_DISTANCE:
+            raise ValueError("Distance to the end of the game does not fit into the table")
+        buckets.setdefault(distance, []).append(
+            (key, mover_pieces, opponent_pieces, is_win)
+        )
+
+    # Count the successors of every position and resolve the ones decided by captures
+    for key, table in tables.items():
+        movers, opponents = key
+        flying = movers == FLYING_CHECKER_COUNT
+        for mover_pieces, opponent_pieces in _iter_positions(movers, opponents):
+            index = position_index(mover_pieces, opponent_pieces)
+            empty = FULL_BOARD ^ (mover_pieces | opponent_pieces)
+            count = 0
+            escape = False
+            shortest_win = 0
+            longest_loss = 0
+
+            for from_point, to_point in _iter_destinations(mover_pieces, empty, flying):
+                remaining = mover_pieces ^ (1 << from_point)
+                if not completes_mill(remaining, to_point):
+                    count += 1
+                    continue
+
+                if opponents - 1 == LOSING_CHECKER_COUNT:
+                    shortest_win = 1
+                    break
+
+                # Every capture leads into an already built smaller table
+                moved = remaining | 1 << to_point
+                for removed_point in iter_points(opponent_pieces):
+                    distance = tablebase.lookup(
+                        opponent_pieces ^ (1 << removed_point), moved
+                    )
+                    if distance is None:
+                        raise FileNotFoundError(
+                            f"Build {table_name(opponents - 1, movers)} first"
+                        )
+                    if distance == 0:
+                        escape = True
+                    elif distance & 1:
+                        longest_loss = max(longest_loss, distance)
+                    elif not shortest_win or distance + 1 < shortest_win:
+                        shortest_win = distance + 1
+
+            if shortest_win:
+                push(shortest_win, key, mover_pieces, opponent_pieces, True)
+                escape = True
+
+            if count == 0 and not escape and not longest_loss:
+                # A blocked side passes the turn
+                count = 1
+
+            table.counts[index] = count
+            table.escapes[index] = escape
+            table.longest_losses[index] = longest_loss
+            if count == 0 and not escape:
+                push(longest_loss + 1, key, mover_pieces, opponent_pieces, False)
+
+    # Resolve the positions in the order of their distance, passing every result to the predecessors
+    distance = 1
+    while buckets:
+        for key, mover_pieces, opponent_pieces, is_win in buckets.pop(distance, ()):
+            table = tables[key]
+            index = position_index(mover_pieces, opponent_pieces)
+            if table.values[index]:
+                continue
+            table.values[index] = distance
+
+            movers, opponents = key
+            predecessors = tables[(opponents, movers)]
+            for previous_pieces in _iter_predecessors(opponent_pieces, mover_pieces):
+                previous_index = position_index(previous_pieces, mover_pieces)
+                if predecessors.values[previous_index]:
+                    continue
+                if not is_win:
+                    push(
+                        distance + 1,
+                        (opponents, movers),
+                        previous_pieces,
+                        mover_pieces,
+                        True,
+                    )
+                    continue
+                if predecessors.escapes[previous_index]:
+                    continue  # The predecessor cannot lose, its successors do not matter
+
+                predecessors.counts[previous_index] -= 1
+                if distance > predecessors.longest_losses[previous_index]:
+                    predecessors.longest_losses[previous_index] = distance
+                if (
+                    not predecessors.counts[previous_index]
+                    and not predecessors.escapes[previous_index]
+                ):
+                    # Every move loses, the longest resistance decides the distance
+                    push(
+                        predecessors.longest_losses[previous_index] + 1,
+                        (opponents, movers),
+                        previous_pieces,
+                        mover_pieces,
+                        False,
+                    )
+        distance += 1
+
+    for (movers, opponents), table in tables.items():
+        with open(os.path.join(directory, table_name(movers, opponents)), "wb") as file:
+            file.write(table.values)
+
+
+def _iter_predecessors(pieces: int, other_pieces: int):
+    """
+    Yields the bitboards the side with 'pieces' could have had before its last move
+    (a move that formed no mill, or a pass), the other side keeping 'other_pieces'.
+    """
+    empty = FULL_BOARD ^ (pieces | other_pieces)
+    flying = pieces.bit_count() == FLYING_CHECKER_COUNT
+
+    for to_point in iter_points(pieces):
+        remaining = pieces ^ (1 << to_point)
+        if completes_mill(remaining, to_point):
+            continue  # The move would have formed a mill and removed a checker
+        sources = empty if flying else ADJACENT_MASKS[to_point] & empty
+        for from_point in iter_points(sources):
+            yield remaining | 1 << from_point
+
+    # The side passed because all of its checkers were blocked
+    if not flying and not any(
+        ADJACENT_MASKS[point] & empty for point in iter_points(pieces)
+    ):
+        yield pieces
+
+
+class Tablebase:
+    """
+    Read-only access to the tables stored in a directory. Missing tables are simply not probed.
+
+    Attributes:
+    - directory: The directory holding the table files.
+    """
+
+    def __init__(self, directory: str = TABLEBASE_DIRECTORY):
+        self.directory = directory
+        self.tables = {}
+
+    def _table(self, mover_count: int, opponent_count: int):
+        """
+        Returns the memory-mapped table for the numbers of checkers, or None if it has not been built.
+        """
+        key = (mover_count, opponent_count)
+        if key not in self.tables:
+            path = os.path.join(self.directory, table_name(mover_count, opponent_count))
+            table = None
+            if os.path.exists(path):
+                with open(path, "rb") as file:
+                    table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+                if len(table) != table_size(mover_count, opponent_count):
+                    raise ValueError(f"{path} has the wrong size")
+            self.tables[key] = table
+
+        return self.tables[key]
+
+    def lookup(self, mover_pieces: int, opponent_pieces: int):
+        """
+        Returns the stored distance of the movement-phase position (side to move first),
+        or None if its table has not been built.
+        """
+        table = self._table(mover_pieces.bit_count(), opponent_pieces.bit_count())
+        if table is None:
+            return None
+        return table[position_index(mover_pieces, opponent_pieces)]
+
+    def probe(self, state: GameState):
+        """
+        Returns the (Outcome, plies) of the position for the side to move,
+        or None if a checker is still in hand or the table has not been built.
+        """
+        player = state.side_to_move
+        if state.in_hand[1] or state.in_hand[2] or state.is_over():
+            return None
+
+        distance = self.lookup(state.board.pieces[player], state.board.pieces[3 - player])
+        if distance is None:
+            return None
+        return outcome_of(distance), distance
+
+    def best_move(self, state: GameState):
+        """
+        Returns the move keeping the best result for the side to move: the fastest win,
+        a move holding the draw or the longest resistance, or None if the position is not covered.
+        """
+        if self.probe(state) is None:
+            return None
+
+        best_move = None
+        best_score = None
+        for move in generate_moves(state):
+            state.make_move(move)
+            try:
+                if state.is_over():
+                    reply = (Outcome.LOSS, 0)
+                else:
+                    reply = self.probe(state)
+            finally:
+                state.unmake_move(move)
+            if reply is None:
+                return None
+
+            # Scores from the side to move's point of view: quick wins, then draws, then slow losses
+            reply_outcome, plies = reply
+            if reply_outcome == Outcome.LOSS:
+                score = 1000 - plies
+            elif reply_outcome == Outcome.DRAW:
+                score = 0
+            else:
+                score = plies - 1000
+            if best_score is None or score > best_score:
+                best_move, best_score = move, score
+
+        return best_move
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build endgame tablebases for the mill AI.")
+    parser.add_argument(
+        "tables",
+        nargs="+",
+        help="Tables to build as AvB (the partner table BvA is built along), smaller ones first.",
+    )
+    parser.add_argument("--directory", default=TABLEBASE_DIRECTORY)
+    args = parser.parse_args()
+
+    for name in args.tables:
+        mover_count, opponent_count = (int(count) for count in name.split("v"))
+        build_tables(mover_count, opponent_count, args.directory)
+        print(f"Built {table_name(mover_count, opponent_count)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Tests of the mill engine: the board bookkeeping, the position hashes, the search and the tablebase.
+
+Run from this directory, like the other scripts:
+    python -m pytest test_engine.py
+
+The tablebase test probes the 3v3 table in the default tablebase directory and is skipped
+when it has not been built (python tablebase.py 3v3, a few minutes).
+"""
+
+import os
+import random
+
+import pytest
+
+from bitboard import CHECKER_KEYS, PIECE_KEYS, SIDE_KEYS, Board, iter_points, mill_points
+from game_state import GameState, generate_moves
+from search import WIN_SCORE, WON_SCORE_LIMIT, MinimaxSearch
+from symmetry import SYMMETRY_COUNT, transform
+from tablebase import TABLEBASE_DIRECTORY, Outcome, Tablebase, table_name
+
+
+def random_state(rng: random.Random, plies: int):
+    """
+    Plays up to 'plies' random moves from the start, stopping early when the game ends
+    or the side to move is blocked.
+    """
+    state = GameState()
+    for _ in range(plies):
+        moves = generate_moves(state)
+        if state.is_over() or not moves:
+            break
+        state.make_move(rng.choice(moves))
+    return state
+
+
+def random_states(count: int, min_plies: int = 0, max_plies: int = 40, seed: int = 0):
+    """
+    Returns 'count' random running games of the placement and the movement phase.
+    """
+    rng = random.Random(seed)
+    states = []
+    while len(states) < count:
+        state = random_state(rng, rng.randint(min_plies, max_plies))
+        if not state.is_over() and generate_moves(state):
+            states.append(state)
+    return states
+
+
+def snapshot(state: GameState):
+    """
+    Returns everything a move changes in the state, the board's bookkeeping included.
+    """
+    board = state.board
+    return (
+        list(board.pieces),
+        board.hash,
+        [list(counts) if counts else counts for counts in board.line_counts],
+        [list(counts) if counts else counts for counts in board.mill_counts],
+        board.score,
+        list(state.checkers),
+        list(state.in_hand),
+        state.side_to_move,
+    )
+
+
+def fresh_score(board: Board):
+    """
+    Recomputes the evaluation from the bitboards alone: one point per checker
+    and five more per checker in a completed mill, positive for Player 2.
+    """
+    score = 0
+    for player, sign in ((1, -1), (2, 1)):
+        pieces = board.pieces[player]
+        score += sign * (pieces.bit_count() + 5 * mill_points(pieces).bit_count())
+    return score
+
+
+def fresh_key(state: GameState):
+    """
+    Recomputes the Zobrist hash of the state from its checkers, side to move and checker counts.
+    """
+    key = SIDE_KEYS[state.side_to_move]
+    for player in (1, 2):
+        for point in iter_points(state.board.pieces[player]):
+            key ^= PIECE_KEYS[player][point]
+        key ^= CHECKER_KEYS[player][state.checkers[player]]
+    return key
+
+
+def plain_minimax(search: MinimaxSearch, state: GameState, depth: int, ply: int = 0):
+    """
+    Minimax without pruning, transposition table or move ordering, scored like MinimaxSearch.minimax.
+    """
+    if state.is_over():
+        return WIN_SCORE - ply if state.winner() == 2 else ply - WIN_SCORE
+    if depth == 0:
+        return search.evaluate(state)
+    moves = generate_moves(state)
+    if not moves:
+        return search.evaluate(state)
+
+    values = []
+    for move in moves:
+        state.make_move(move)
+        values.append(plain_minimax(search, state, depth - 1, ply + 1))
+        state.unmake_move(move)
+    return max(values) if state.side_to_move == 2 else min(values)
+
+
+@pytest.mark.parametrize("canonical_positions", [True, False])
+def test_alpha_beta_value_equals_plain_minimax(canonical_positions):
+    for state in random_states(8, seed=1):
+        search = MinimaxSearch(canonical_positions=canonical_positions)
+        value, best_moves = search.search_root(state, generate_moves(state), 3)
+
+        assert value == plain_minimax(search, state, 3)
+        assert best_moves
+
+
+def test_make_unmake_restores_state_and_score():
+    rng = random.Random(2)
+    for state in random_states(20, seed=2):
+        before = snapshot(state)
+        for move in generate_moves(state):
+            state.make_move(move)
+            assert state.board.score == fresh_score(state.board)
+            state.unmake_move(move)
+            assert snapshot(state) == before
+        assert state.board.score == fresh_score(state.board)
+
+        # A longer line of moves taken back in reverse order
+        played = []
+        while len(played) < 10 and not state.is_over() and generate_moves(state):
+            played.append(rng.choice(generate_moves(state)))
+            state.make_move(played[-1])
+        for move in reversed(played):
+            state.unmake_move(move)
+        assert snapshot(state) == before
+
+
+def test_zobrist_key_equals_recompute():
+    rng = random.Random(3)
+    for state in random_states(20, seed=3):
+        assert state.key() == fresh_key(state)
+        for move in rng.sample(generate_moves(state), min(5, len(generate_moves(state)))):
+            state.make_move(move)
+            assert state.key() == fresh_key(state)
+            assert state.board.hash == Board(state.board.pieces[1], state.board.pieces[2]).hash
+            state.unmake_move(move)
+
+
+def test_canonical_key_is_invariant_under_symmetries():
+    for state in random_states(20, seed=4):
+        key, _ = state.canonical_key()
+        for symmetry in range(SYMMETRY_COUNT):
+            image = GameState(
+                Board(
+                    transform(state.board.pieces[1], symmetry),
+                    transform(state.board.pieces[2], symmetry),
+                ),
+                (state.checkers[1], state.checkers[2]),
+                (state.in_hand[1], state.in_hand[2]),
+                state.side_to_move,
+            )
+            assert image.canonical_key()[0] == key
+
+
+def test_tablebase_agrees_with_shallow_search():
+    if not os.path.exists(os.path.join(TABLEBASE_DIRECTORY, table_name(3, 3))):
+        pytest.skip("The 3v3 table has not been built (python tablebase.py 3v3)")
+
+    depth = 3
+    tablebase = Tablebase()
+    rng = random.Random(5)
+    checked = {Outcome.WIN: 0, Outcome.LOSS: 0, Outcome.DRAW: 0}
+    for _ in range(60):
+        points = rng.sample(range(24), 6)
+        board = Board(sum(1 << point for point in points[:3]), sum(1 << point for point in points[3:]))
+        state = GameState(board, (3, 3), (0, 0), 2)
+        outcome, plies = tablebase.probe(state)
+        checked[outcome] += 1
+
+        value, _ = MinimaxSearch().search_root(state, generate_moves(state), depth)
+        # Player 2 is the side to move, a won game scores WIN_SCORE minus its length in plies
+        if outcome == Outcome.WIN and plies <= depth:
+            assert value == WIN_SCORE - plies
+        elif outcome == Outcome.LOSS and plies <= depth:
+            assert value == plies - WIN_SCORE
+        else:
+            assert abs(value) < WON_SCORE_LIMIT
+
+        if outcome != Outcome.DRAW:
+            move = tablebase.best_move(state)
+            state.make_move(move)
+            reply = (Outcome.LOSS, 0) if state.is_over() else tablebase.probe(state)
+            assert reply[0] != outcome and reply[1] == plies - 1
+
+    assert checked[Outcome.WIN] and checked[Outcome.LOSS]
@@ -0,0 +1,99 @@
+"""
+Transposition table for the Nine Men's Morris AI.
+
+The search reaches the same positions through different move orders. Every
+searched position is stored under its Zobrist hash (see ``bitboard.py``) together
+with the depth it was searched to, the kind of score found and the best move,
+so that repeated subtrees can be cut short or at least searched in a better order.
+"""
+
+
+# Kinds of stored scores
+EXACT = 0
+LOWER_BOUND = 1  # The search failed high, the real score is at least the stored one
+UPPER_BOUND = 2  # The search failed low, the real score is at most the stored one
+
+
+class TranspositionTable:
+    """
+    Fixed-size hash table of searched positions.
+
+    Every slot holds a (key, depth, bound, value, best_move, generation) tuple.
+    A new entry replaces the stored one when the slot is empty, holds the same
+    position, was written during an earlier AI turn or was searched less deep.
+
+    Attributes:
+    - size: Number of slots, always a power of two.
+    - generation: Number of the current AI turn, used to age out old entries.
+    - hits, misses: Probe statistics.
+    - stores, overwrites: Store statistics, overwrites count replaced entries of other positions.
+    """
+
+    def __init__(self, size_bits: int = 18):
+        """
+        Initializes an empty table with 2 ** size_bits slots.
+        """
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0
+
+    def new_search(self):
+        """
+        Starts a new AI turn, entries stored so far become candidates for replacement.
+        """
+        self.generation += 1
+
+    def clear(self):
+        """
+        Removes all entries and resets the statistics.
+        """
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.hits = self.misses = self.stores = self.overwrites = 0
+
+    def probe(self, key: int):
+        """
+        Returns the (key, depth, bound, value, best_move, generation) entry stored for the position, or None.
+        """
+        entry = self.entries[key & self.mask]
+
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, bound: int, value: int, best_move):
+        """
+        Stores a search result for the position, following the replacement policy.
+
+        Args:
+        - key: Zobrist hash of the position.
+        - depth: Remaining depth the position was searched to.
+        - bound: EXACT, LOWER_BOUND or UPPER_BOUND.
+        - value: The score found by the search.
+        - best_move: The best (or cutoff) move found, None if there was none.
+        """
+        index = key & self.mask
+        entry = self.entries[index]
+
+        if entry is not None and entry[0] != key:
+            if entry[5] == self.generation and entry[1] > depth:
+                return
+            self.overwrites += 1
+
+        self.entries[index] = (key, depth, bound, value, best_move, self.generation)
+        self.stores += 1
+
+    def hit_rate(self):
+        """
+        Returns the fraction of probes that found their position.
+        """
+        probes = self.hits + self.misses
+        return self.hits / probes if probes else 0.0